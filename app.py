@@ -1,3 +1,6 @@
+import logging
+import re
+
 from ddl_manager import DDLManager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
@@ -15,6 +18,13 @@ ddl_manager = DDLManager(storage_manager)
 dml_manager = DMLManager(storage_manager)
 query_manager = QueryManager(storage_manager, ddl_manager, dml_manager)
 
+# Query timings from track_time are logged at INFO
+logging.basicConfig(level=logging.INFO)
+
+# One statement of a script: text up to a ';', where quoted strings are taken
+# whole so a ';' inside one does not end the statement
+_STATEMENT = re.compile(r"""(?:[^;'"]|'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|['"])+""")
+
 app = FastAPI()
 
 app.add_middleware(
@@ -33,11 +43,11 @@ class QueryRequest(BaseModel):
 @app.post("/query")
 async def execute_query(data: QueryRequest):
     try:
-        queries = data.query.split(";")
         last_res, total_runtime = None, 0
-        for query in queries:
-            if query.strip():  # Skip empty queries
-                last_res, runtime = query_manager.execute_query(query.strip())
+        for match in _STATEMENT.finditer(data.query):
+            query = match.group().strip()
+            if query:  # Skip empty queries
+                last_res, runtime = query_manager.execute_query(query)
                 total_runtime += runtime
         return {"result": last_res, "runtime": total_runtime}
     except Exception as e:
@@ -1,5 +1,4 @@
-from BTrees.OOBTree import OOBTree
-
+from storage_manager import PostingList, new_index_tree
 from utils import DOUBLE, INT, STRING
 
 
@@ -12,9 +11,8 @@ class DDLManager:
         self.db = self.storage_manager.db
 
     def reload(self):
-        """Reloads the latest data and index"""
-        self.storage_manager.load_db()
-        self.storage_manager.load_index()
+        """Reloads the latest data and index, if another process changed them"""
+        self.storage_manager.refresh()
 
     def create_index(self, table_name, column_name, index_name=None):
         """Creates (or recreates) an index on a specified column of a table."""
@@ -34,7 +32,7 @@ class DDLManager:
         if column_name in self.index[table_name]:
             old = self.index[table_name][column_name]
             self.index[table_name][column_name] = {
-                "tree": OOBTree(),
+                "tree": new_index_tree(),
                 "name": old.get(
                     "name",
                     (
@@ -46,7 +44,7 @@ class DDLManager:
             }
         else:
             self.index[table_name][column_name] = {
-                "tree": OOBTree(),
+                "tree": new_index_tree(),
                 "name": (
                     index_name
                     if index_name is not None
@@ -54,13 +52,12 @@ class DDLManager:
                 ),
             }
 
-        col_names = list(self.db["COLUMNS"][table_name].keys())
-        col_idx = col_names.index(column_name)
+        col_idx = self.storage_manager.schema(table_name).col_idx[column_name]
         tree = self.index[table_name][column_name]["tree"]
 
         for row_id, row in enumerate(self.db["DATA"][table_name]):
             key = row[col_idx]
-            tree.setdefault(key, []).append(row_id)
+            tree.setdefault(key, PostingList()).append(row_id)
 
         self.storage_manager.save_index()
 
@@ -108,6 +105,7 @@ class DDLManager:
             col_name: col_type for col_name, col_type in columns
         }
         self.db["DATA"][table_name] = []
+        self.storage_manager.invalidate_schema(table_name)
 
        
         self.index[table_name] = {}
@@ -156,6 +154,7 @@ class DDLManager:
         self.db["COLUMNS"].pop(table_name, None)
         self.db["DATA"].pop(table_name, None)
         self.db["FOREIGN_KEYS"].pop(table_name, None)  # Remove if exists
+        self.storage_manager.invalidate_schema(table_name)
 
         # Remove table indexes
         self.index.pop(table_name, None)
@@ -1,10 +1,32 @@
+import bisect
 from collections import defaultdict
-from BTrees.OOBTree import OOBTree
 
-from utils import DESC, DOUBLE, INT, MAX, MIN, STRING, SUM, _make_where_fn
+from storage_manager import PostingList
+from utils import COUNT, DESC, DOUBLE, INT, MAX, MIN, SUM, _make_where_fn
 import utils
 
 
+# How stored values are cast when read back, per column type
+_CASTS = {INT: int, DOUBLE: float}
+
+
+def _same(value):
+    return value
+
+
+def _index_add(tree, key, rid):
+    """Add a row id to an index, keeping the key's postings sorted"""
+    bisect.insort(tree.setdefault(key, PostingList()), rid)
+
+
+def _index_remove(tree, key, rid):
+    """Remove a row id from an index, dropping the key once it has no rows"""
+    rids = tree[key]
+    rids.remove(rid)
+    if not rids:
+        del tree[key]
+
+
 class DMLManager:
 
     def __init__(self, storage_manager):
@@ -13,9 +35,8 @@ class DMLManager:
         self.index = self.storage_manager.index
 
     def reload(self):
-        """Reload the latest data and indexes"""
-        self.storage_manager.load_db()
-        self.storage_manager.load_index()
+        """Reload the latest data and indexes, if another process changed them"""
+        self.storage_manager.refresh()
 
     def insert(self, table_name, row):
         self.reload()
@@ -24,39 +45,84 @@ class DMLManager:
         if table_name not in self.db["TABLES"]:
             raise ValueError(f"Table '{table_name}' does not exist")
 
-        # Retrieve table columns (expected as list of tuples: (column_name, column_type))
-        table_columns = self.db["COLUMNS"][table_name]
-        # Extract column names for easier lookup later
-        col_names = list(table_columns.keys())
+        # Cached column layout of the table
+        schema = self.storage_manager.schema(table_name)
+        self._validate_row(table_name, schema, row)
+
+        # Append the new row
+        self.db["DATA"][table_name].append(row)
+        new_row_id = len(self.db["DATA"][table_name]) - 1
+        self._index_rows(table_name, schema, [row], new_row_id)
+
+        # Save changes to the database and index storage
+        self.storage_manager.save_db()
+        self.storage_manager.save_index()
 
+    def insert_many(self, table_name, rows):
+        """
+        Insert several rows with a single reload and a single save of the
+        database and index files. Every row is validated before any is
+        appended, so one bad row leaves the table unchanged.
+        Returns the number of rows inserted.
+        """
+        self.reload()
+
+        if table_name not in self.db["TABLES"]:
+            raise ValueError(f"Table '{table_name}' does not exist")
+
+        schema = self.storage_manager.schema(table_name)
+        rows = list(rows)
+
+        table_data = self.db["DATA"][table_name]
+
+        # Primary keys are checked against one set instead of per-row lookups
+        taken_pks = None
+        primary_key = self.db["TABLES"][table_name].get("primary_key")
+        if primary_key in schema.col_idx:
+            pk_index = schema.col_idx[primary_key]
+            taken_pks = {r[pk_index] for r in table_data}
+
+        # A self-referencing foreign key may point at a row accepted earlier
+        # in the batch, as with one insert per row
+        ref_values = {}
+        self_refs = [
+            (ref_col, schema.col_idx[ref_col])
+            for _, ref_table, ref_col in self.db["TABLES"][table_name].get("foreign_keys", ())
+            if ref_table == table_name and ref_col in schema.col_idx
+        ]
+        for ref_col, i in self_refs:
+            ref_values[(table_name, ref_col)] = {r[i] for r in table_data}
+
+        for row in rows:
+            self._validate_row(table_name, schema, row, taken_pks, ref_values)
+            for ref_col, i in self_refs:
+                ref_values[(table_name, ref_col)].add(row[i])
+
+        first_row_id = len(table_data)
+        table_data.extend(rows)
+        self._index_rows(table_name, schema, rows, first_row_id)
+
+        self.storage_manager.save_db()
+        self.storage_manager.save_index()
+        return len(rows)
+
+    def _validate_row(self, table_name, schema, row, taken_pks=None, ref_values=None):
+        """
+        Check a row's length, types, primary key and foreign keys before it is
+        inserted. For batches, taken_pks is the set of primary keys in use,
+        which grows with each checked row, and ref_values caches the values
+        of referenced columns as sets.
+        """
         # Validate row length against table columns
-        if len(row) != len(table_columns):
+        if len(row) != len(schema.col_names):
             raise ValueError("Row length does not match the number of table columns.")
 
-        table_columns_items = list(self.db["COLUMNS"][table_name].items())
         # Check that each value's type matches the column's expected type
-        for i, (col_name, col_type) in enumerate(table_columns_items):
-            if row[i] is None:
-                continue
-            if col_type == INT:
-                if not isinstance(row[i], int):
-                    raise ValueError(
-                        f"Column '{col_name}' expects type int, but got {type(row[i]).__name__}."
-                    )
-            elif col_type == STRING:
-                if not isinstance(row[i], str):
-                    raise ValueError(
-                        f"Column '{col_name}' expects type string, but got {type(row[i]).__name__}."
-                    )
-            elif col_type == DOUBLE:
-                if not isinstance(row[i], float):
-                    raise ValueError(
-                        f"Column '{col_name}' expects type double, but got {type(row[i]).__name__}."
-                    )
-            else:
-                raise ValueError(
-                    f"Unsupported column type '{col_type}' for column '{col_name}'."
-                )
+        if not all(
+            v is None or (t is not None and isinstance(v, t))
+            for v, t in zip(row, schema.py_types)
+        ):
+            self._raise_type_error(schema, row)
 
         # Check for duplicate based on primary key if defined
         table_def = self.db["TABLES"][table_name]
@@ -64,16 +130,20 @@ class DMLManager:
             primary_key = table_def["primary_key"]
             # Find the primary key column index using the extracted column names
             try:
-                pk_index = list(self.db["COLUMNS"][table_name].keys()).index(
-                    primary_key
-                )
-            except ValueError:
+                pk_index = schema.col_idx[primary_key]
+            except KeyError:
                 raise ValueError(
                     f"Primary key '{primary_key}' is not defined in the table columns."
                 )
             pk_value = row[pk_index]
+            if taken_pks is not None:
+                if pk_value in taken_pks:
+                    raise ValueError(
+                        f"Duplicate entry for primary key '{primary_key}' with value '{pk_value}'."
+                    )
+                taken_pks.add(pk_value)
             # Use the index if available for quick duplicate check
-            if table_name in self.index and primary_key in self.index[table_name]:
+            elif table_name in self.index and primary_key in self.index[table_name]:
                 if pk_value in self.index[table_name][primary_key]["tree"]:
                     raise ValueError(
                         f"Duplicate entry for primary key '{primary_key}' with value '{pk_value}'."
@@ -94,8 +164,8 @@ class DMLManager:
                 ref_table = ref[1]  # referenced table
                 ref_col = ref[2]  # referenced column
                 try:
-                    fk_index = col_names.index(col_name)
-                except ValueError:
+                    fk_index = schema.col_idx[col_name]
+                except KeyError:
                     raise ValueError(
                         f"Foreign key column '{col_name}' is not defined in the table columns."
                     )
@@ -109,39 +179,52 @@ class DMLManager:
                         f"Referenced table '{ref_table}' for foreign key '{col_name}' does not exist."
                     )
                 ref_table_data = self.db["DATA"][ref_table]
-                ref_table_columns = self.db["COLUMNS"][ref_table]
                 try:
-                    ref_col_index = list(ref_table_columns.keys()).index(ref_col)
-                except ValueError:
+                    ref_col_index = self.storage_manager.schema(ref_table).col_idx[ref_col]
+                except KeyError:
                     raise ValueError(
                         f"Referenced column '{col_name}' in table '{ref_table}' does not exist."
                     )
-                if not any(row[ref_col_index] == fk_value for row in ref_table_data):
+                if ref_values is not None:
+                    key = (ref_table, ref_col)
+                    if key not in ref_values:
+                        ref_values[key] = {r[ref_col_index] for r in ref_table_data}
+                    found = fk_value in ref_values[key]
+                else:
+                    found = any(r[ref_col_index] == fk_value for r in ref_table_data)
+                if not found:
                     raise ValueError(
                         f"Foreign key constraint violation: value '{fk_value}' in column '{col_name}' "
                         f"does not exist in referenced table '{ref_table}', column '{ref_col}'."
                     )
 
-        # Append the new row
-        self.db["DATA"][table_name].append(row)
-        new_row_id = len(self.db["DATA"][table_name]) - 1
-
-        # Update indexes if they exist
-        if table_name in self.index:
-            for col_name, index in self.index[table_name].items():
-                try:
-                    col_index = col_names.index(col_name)
-                except ValueError:
-                    continue  # Skip if column not found
-                tree = index["tree"]
-                value = row[col_index]
-                if value not in tree:
-                    tree[value] = []
-                tree[value].append(new_row_id)
-
-        # Save changes to the database and index storage
-        self.storage_manager.save_db()
-        self.storage_manager.save_index()
+    def _index_rows(self, table_name, schema, rows, first_row_id):
+        """Add rows appended at first_row_id onwards to the table's indexes"""
+        if table_name not in self.index:
+            return
+        for col_name, index in self.index[table_name].items():
+            col_index = schema.col_idx.get(col_name)
+            if col_index is None:
+                continue  # Skip if column not found
+            tree = index["tree"]
+            for new_row_id, row in enumerate(rows, first_row_id):
+                tree.setdefault(row[col_index], PostingList()).append(new_row_id)
+
+    def _raise_type_error(self, schema, row):
+        """Report the first value of a row not matching its column's type"""
+        for col_name, col_type, py_type, v in zip(
+            schema.col_names, schema.col_types, schema.py_types, row
+        ):
+            if v is None:
+                continue
+            if py_type is None:
+                raise ValueError(
+                    f"Unsupported column type '{col_type}' for column '{col_name}'."
+                )
+            if not isinstance(v, py_type):
+                raise ValueError(
+                    f"Column '{col_name}' expects type {col_type}, but got {type(v).__name__}."
+                )
 
     def select(
             self,
@@ -159,92 +242,135 @@ class DMLManager:
         if table_name not in self.db["TABLES"]:
             raise ValueError(f"Table '{table_name}' does not exist")
 
-        table_columns = self.db["COLUMNS"][table_name]
+        schema = self.storage_manager.schema(table_name)
 
         # Validate columns exist
         if columns:
-            table_columns_set = set(table_columns.keys())
             for col in columns:
-                if col not in table_columns_set:
+                if col not in schema.col_idx:
                     raise ValueError(
                         f"Column '{col}' does not exist in table '{table_name}'."
                     )
 
-        col_names = list(table_columns.keys())
+        col_names = schema.col_names
         table_data = self.db["DATA"][table_name]
 
-        # Check if there's an index on the column used in the 'where' condition
-        use_index = False
-        where_column = None
-        if where and isinstance(where, dict):
-            where_column = next((col for col in where if col in col_names), None)
-            if where_column and where_column in self.index.get(table_name, {}):
-                use_index = True
+        # Non-callable wheres are compiled to run on the raw row lists, so a
+        # row dict is only built for rows that match
+        where_fn = row_fn = None
+        if callable(where):
+            where_fn = where
+        elif where is not None:
+            row_fn = self._row_where_fn(where, schema)
+
+        # Narrow the scan to candidate row ids: first through the indexes,
+        # then through the column arrays' bitmaps, else every row
+        bits = None
+        ids = None if callable(where) else self._indexed_ids(table_name, where)
+        if ids is not None:
+            candidates = ((rid, table_data[rid]) for rid in sorted(ids))
+        else:
+            bits = None if callable(where) else self._where_bitmap(table_name, where)
+            if bits is not None:
+                # The bitmap already is the exact answer, only fetch its rows
+                candidates = (
+                    (rid, table_data[rid])
+                    for rid in utils.bitmap_row_ids(bits, len(table_data)).tolist()
+                )
+                row_fn = None
+            else:
+                candidates = enumerate(table_data)
+
+        casts = [_CASTS.get(t, _same) for t in schema.col_types]
+
+        # A lone COUNT(*) only needs the number of matches, no result rows.
+        # Callables are fed just the columns they declare they read. No match
+        # gives no result row, as for every other aggregate.
+        where_cols = getattr(where_fn, "columns", None) if where_fn else ()
+        if (
+            aggregates == [{COUNT: "*"}]
+            and not columns
+            and group_by is None
+            and not having
+            and where_cols is not None
+            and all(c in schema.col_idx for c in where_cols)
+        ):
+            if bits is not None:
+                count = utils.bitmap_count(bits)
+            elif where_fn is not None:
+                need = [(c, schema.col_idx[c], casts[schema.col_idx[c]]) for c in set(where_cols)]
+                count = sum(
+                    1
+                    for _, row_list in candidates
+                    if where_fn({c: cast(row_list[i]) for c, i, cast in need})
+                )
+            elif row_fn is None:
+                count = len(table_data)
+            else:
+                count = sum(1 for _, row_list in candidates if row_fn(row_list))
+            return [{utils.agg_key("*"): count}] if count else []
+
+        # columns=[] next to aggregates, as for SELECT COUNT(*), keeps no
+        # plain columns in the result
+        project = bool(columns) or (columns == [] and aggregates is not None)
+
+        # (name, position, cast) of the columns each result row is built
+        # from; a callable where sees every column and is projected after
+        out_cols = columns if project and where_fn is None else col_names
+        want = [(c, schema.col_idx[c], casts[schema.col_idx[c]]) for c in out_cols]
 
         filtered_rows = []
+        # Row ids behind filtered_rows, None meaning the whole table
+        row_ids = None if where is None else []
 
-        if use_index and where_column:
-            # Use the index for faster search
-            index_tree = self.index[table_name][where_column]["tree"]
-            for key, row_ids in index_tree.items():
-                # Apply where condition on indexed rows
-                for row_id in row_ids:
-                    row = table_data[row_id]
-                    row_dict = {col_names[i]: row[i] for i in range(len(row))}
-                    if where_fn(row_dict):
-                        filtered_rows.append(row_dict)
-        else:
-            # If no index is available, scan all rows
-            if callable(where):
-                where_fn = where
-            else:
-                where_fn = _make_where_fn(where, col_names)
-
-            for row_list in table_data:
-                row_dict = {}
-                for col, raw in zip(col_names, row_list):
-                    col_type = table_columns[col]
-                    if col_type == INT:
-                        row_dict[col] = int(raw)
-                    elif col_type == DOUBLE:
-                        row_dict[col] = float(raw)
-                    else:  # STRING
-                        row_dict[col] = raw
-
-                if where_fn(row_dict):
-                    filtered_rows.append(row_dict)
+        for rid, row_list in candidates:
+            if row_fn is not None and not row_fn(row_list):
+                continue
 
-        if columns:
+            row_dict = {c: cast(row_list[i]) for c, i, cast in want}
+
+            if where_fn is not None and not where_fn(row_dict):
+                continue
+
+            filtered_rows.append(row_dict)
+            if row_ids is not None:
+                row_ids.append(rid)
+
+        if project and where_fn is not None:
             filtered_rows = [
-                {col: row[col] for col in columns if col in row}
-                for row in filtered_rows
+                {col: row[col] for col in columns} for row in filtered_rows
             ]
 
-        group_by_res = []
-        if group_by is not None:
-            group_by_res = utils.group_by(filtered_rows, group_by)
-        else:
-            group_by_res = filtered_rows
+        if group_by is None and aggregates is None:
+            return utils.order_by(filtered_rows, order_by) if order_by else filtered_rows
 
-        aggregates_res = []
         if aggregates is not None:
-            aggregates_res = utils.aggregation(group_by_res, aggregates, group_by)
+            aggregates_res = None
+            if filtered_rows:
+                aggregates_res = self._column_aggregates(
+                    table_name, filtered_rows, aggregates, row_ids, group_by
+                )
+            if aggregates_res is None:
+                if group_by is not None:
+                    group_by_res = utils.group_by(filtered_rows, group_by)
+                else:
+                    group_by_res = filtered_rows
+                aggregates_res = utils.aggregation(group_by_res, aggregates, group_by)
             if having:
                 if callable(having):
                     having_fn = having
                 else:
-                    having_fn = _make_where_fn(having, col_names)
+                    having_fn = _make_where_fn(having, col_names, schema.col_idx)
                 aggregates_res = [row for row in aggregates_res if having_fn(row)]
         else:
-            if isinstance(group_by_res, defaultdict):
-                group_by_res = [
-                    {
-                        **{group_by[i]: group_key[i] for i in range(len(group_key))},
-                        **group_rows[0],
-                    }
-                    for group_key, group_rows in group_by_res.items()
-                ]
-            aggregates_res = group_by_res
+            group_by_res = utils.group_by(filtered_rows, group_by)
+            aggregates_res = [
+                {
+                    **{group_by[i]: group_key[i] for i in range(len(group_key))},
+                    **group_rows[0],
+                }
+                for group_key, group_rows in group_by_res.items()
+            ]
 
         if order_by:
             results = utils.order_by(aggregates_res, order_by)
@@ -253,6 +379,248 @@ class DMLManager:
 
         return results
 
+    def _row_where_fn(self, where, schema):
+        """where_fn over raw row lists, compiled unless it is a callable"""
+        if where is None or callable(where):
+            return _make_where_fn(where, schema.col_names, schema.col_idx)
+        return utils.compile_where(where, schema.col_idx)
+
+    def _indexed_ids(self, table_name, where):
+        """
+        Candidate row ids for a where, taken from the table's indexes without
+        touching any rows. Equalities on indexed columns are tree lookups and
+        <, >, <= and >= are range scans over the tree; in an AND one indexed side is
+        enough, as the other side is checked on the candidates only. Returns
+        a set of row ids (a superset of the matches), or None when the
+        indexes cannot narrow the where.
+        """
+        table_index = self.index.get(table_name, {})
+
+        def leaf_ids(cond):
+            if not isinstance(cond, list) or len(cond) != 3:
+                return None
+            col, op, val = cond
+            if col not in table_index or val is None:
+                return None
+            tree = table_index[col]["tree"]
+            try:
+                if op == "=":
+                    return set(tree.get(val, ()))
+                if op == ">":
+                    postings = tree.values(min=val, excludemin=True)
+                elif op == "<":
+                    postings = tree.values(max=val, excludemax=True)
+                elif op == ">=":
+                    postings = tree.values(min=val)
+                elif op == "<=":
+                    postings = tree.values(max=val)
+                else:
+                    return None
+                return {rid for rids in postings for rid in rids}
+            except TypeError:  # value not comparable with the index keys
+                return None
+
+        if isinstance(where, list):
+            return leaf_ids(where)
+
+        if isinstance(where, dict) and where.get("op") in ("AND", "OR"):
+            left = self._indexed_ids(table_name, where["left"])
+            if where["op"] == "AND":
+                if left is not None and not left:
+                    return left
+                right = self._indexed_ids(table_name, where["right"])
+                if left is None or right is None:
+                    return left if right is None else right
+                return left & right
+            if left is None:
+                return None
+            right = self._indexed_ids(table_name, where["right"])
+            if right is None:
+                return None
+            return left | right
+
+        return None
+
+    def _where_bitmap(self, table_name, where):
+        """
+        Evaluate a where made only of comparisons between an INT/DOUBLE column
+        and a number, e.g. ["id", "=", 3] or
+        {"op": "AND", "left": [...], "right": [...]} (AND/OR may nest), over
+        the table's cached column arrays. Returns a packed bitmap over the table's rows, or None
+        when the where has any other shape.
+        """
+        col_idx = self.storage_manager.schema(table_name).col_idx
+
+        def leaf_bits(cond):
+            if not isinstance(cond, list) or len(cond) != 3:
+                return None
+            col, op, val = cond
+            if col not in col_idx or op not in utils._CMP_OPS:
+                return None
+            if isinstance(val, bool) or not isinstance(val, (int, float)):
+                return None
+            arr = self.storage_manager.column_array(table_name, col)
+            if arr is None:
+                return None
+            return utils.cmp_bitmap(arr, op, val)
+
+        def bits(cond):
+            if isinstance(cond, list):
+                return leaf_bits(cond)
+            if isinstance(cond, dict) and cond.get("op") in ("AND", "OR"):
+                left = bits(cond["left"])
+                if left is None:
+                    return None
+                right = bits(cond["right"])
+                if right is None:
+                    return None
+                if cond["op"] == "AND":
+                    return utils.bitmap_and(left, right)
+                return utils.bitmap_or(left, right)
+            return None
+
+        return bits(where)
+
+    def _bitmap_row_ids(self, table_name, where):
+        """Ascending row ids matching a where, when _where_bitmap can answer it"""
+        if where is None or callable(where):
+            return None
+        bits = self._where_bitmap(table_name, where)
+        if bits is None:
+            return None
+        return utils.bitmap_row_ids(bits, len(self.db["DATA"][table_name])).tolist()
+
+    def _column_aggregates(self, table_name, rows, aggregates, row_ids, group_by=None):
+        """
+        Compute aggregates straight from the cached column arrays, restricted
+        to row_ids (None for every row); rows are the matching result rows in
+        the same order. With group_by, each row gets an integer group id and
+        every aggregate is then one numpy pass over all groups. Returns the
+        aggregated rows, or None when an aggregated column has no numeric
+        array.
+        """
+        col_idx = self.storage_manager.schema(table_name).col_idx
+        arrays = []
+        for agg_dict in reversed(aggregates):
+            for agg_func, col in agg_dict.items():
+                if col == "*" and agg_func == COUNT:
+                    # Only the number of rows matters, not any column
+                    arrays.append((agg_func, utils.agg_key(col), None))
+                    continue
+                if col not in col_idx:
+                    return None
+                arr = self.storage_manager.column_array(table_name, col)
+                if arr is None:
+                    return None
+                arrays.append((agg_func, col, arr if row_ids is None else arr[row_ids]))
+
+        if group_by is None:
+            agg_cols = {col for _, col, _ in arrays}
+            result_row = {k: v for k, v in rows[0].items() if k not in agg_cols}
+            for agg_func, col, arr in arrays:
+                if arr is None:
+                    result_row[col] = len(rows)
+                else:
+                    result_row[col] = utils.column_aggregate(agg_func, arr)
+            return [result_row]
+
+        if not all(col in rows[0] for col in group_by):
+            raise ValueError(
+                "One or more columns in 'group_by' are not selected in the query"
+            )
+        group_of = {}
+        group_ids = [
+            group_of.setdefault(tuple(row[g] for g in group_by), len(group_of))
+            for row in rows
+        ]
+        results = [dict(zip(group_by, key)) for key in group_of]
+        for agg_func, col, arr in arrays:
+            values = utils.grouped_column_aggregate(agg_func, arr, group_ids, len(group_of))
+            for result_row, value in zip(results, values):
+                result_row[col] = value
+        return results
+
+    @staticmethod
+    def _join_column(col, outer_pos, inner_pos):
+        """
+        The qualified alias.col name of a join's where column. A bare column
+        name resolves to the one table having it. Raises ValueError when
+        neither table has it, or both do.
+        """
+        if col in outer_pos or col in inner_pos:
+            return col
+        found = [k for k in (*outer_pos, *inner_pos) if k.partition(".")[2] == col]
+        if not found:
+            raise ValueError(f"Column '{col}' does not exist in the joined tables.")
+        if len(found) > 1:
+            raise ValueError(f"Column '{col}' is ambiguous, qualify it with its table.")
+        return found[0]
+
+    def _qualify_join_where(self, where, outer_pos, inner_pos):
+        """The list/dict where of a join with every column qualified"""
+        if isinstance(where, list) and len(where) == 3:
+            col, op, val = where
+            return [self._join_column(col, outer_pos, inner_pos), op, val]
+        if isinstance(where, dict) and "left" in where and "right" in where:
+            return {
+                **where,
+                "left": self._qualify_join_where(where["left"], outer_pos, inner_pos),
+                "right": self._qualify_join_where(where["right"], outer_pos, inner_pos),
+            }
+        return where
+
+    def _join_pair_fn(self, where, outer_pos, inner_pos):
+        """
+        Build f(outer_row, inner_row) -> bool evaluating a join's where on the
+        raw rows. outer_pos / inner_pos map qualified column names to row
+        positions. Callables are supported when they expose the columns they
+        read through a `columns` attribute; they then get a dict holding only
+        those columns. Returns None when the where cannot be pushed down.
+        """
+        if where is None:
+            return None
+
+        def locate(col):
+            col = self._join_column(col, outer_pos, inner_pos)
+            if col in outer_pos:
+                return 0, outer_pos[col]
+            return 1, inner_pos[col]
+
+        if callable(where):
+            cols = getattr(where, "columns", None)
+            if cols is None:
+                return None
+            needed = [(col, *locate(col)) for col in set(cols)]
+            return lambda o_row, i_row: where(
+                {col: (i_row if side else o_row)[i] for col, side, i in needed}
+            )
+
+        def leaf_fn(cond):
+            if not isinstance(cond, list) or len(cond) != 3:
+                return None
+            col, op, val = cond
+            if op not in utils._CMP_OPS:
+                return None
+            side, i = locate(col)
+            cmp = utils._CMP_OPS[op]
+            if side:
+                return lambda o_row, i_row: cmp(i_row[i], val)
+            return lambda o_row, i_row: cmp(o_row[i], val)
+
+        def pair_fn(cond):
+            if isinstance(cond, list):
+                return leaf_fn(cond)
+            if isinstance(cond, dict) and cond.get("op") in ("AND", "OR"):
+                left, right = pair_fn(cond["left"]), pair_fn(cond["right"])
+                if left is None or right is None:
+                    return None
+                if cond["op"] == "AND":
+                    return lambda o_row, i_row: left(o_row, i_row) and right(o_row, i_row)
+                return lambda o_row, i_row: left(o_row, i_row) or right(o_row, i_row)
+            return None
+
+        return pair_fn(where)
+
     def delete(self, table_name, where=None):
 
         self.reload()
@@ -260,38 +628,32 @@ class DMLManager:
             raise ValueError(f"Table '{table_name}' does not exist")
 
         original = self.db["DATA"][table_name]
-        cols_def = self.db["COLUMNS"][table_name]
-        col_names = list(cols_def.keys())
-        col_idx = {c: i for i, c in enumerate(col_names)}
-
-        where_fn = _make_where_fn(where, col_names)
-
-        new_data = []
-        delete_count = 0
-        for row in original:
-            if where_fn(row):
-                delete_count += 1
-            else:
-                new_data.append(row)
+        schema = self.storage_manager.schema(table_name)
+
+        deleted = self._bitmap_row_ids(table_name, where)
+        if deleted is not None:
+            # Keep the runs of rows between the deleted ones
+            new_data = []
+            start = 0
+            for rid in deleted:
+                new_data.extend(original[start:rid])
+                start = rid + 1
+            new_data.extend(original[start:])
+        else:
+            where_fn = self._row_where_fn(where, schema)
+            new_data = []
+            deleted = []  # ascending row ids of the deleted rows
+            for rid, row in enumerate(original):
+                if where_fn(row):
+                    deleted.append(rid)
+                else:
+                    new_data.append(row)
+        delete_count = len(deleted)
         self.db["DATA"][table_name] = new_data
+        self.storage_manager.invalidate_columns(table_name)
 
-        if table_name in self.index:
-
-            for col, info in list(self.index[table_name].items()):
-                name = (
-                    info.get("name", f"{table_name}_{col}_idx")
-                    if isinstance(info, dict)
-                    else f"{table_name}_{col}_idx"
-                )
-                self.index[table_name][col] = {"tree": OOBTree(), "name": name}
-
-            for rid, row in enumerate(new_data):
-                for col, info in self.index[table_name].items():
-                    tree = info["tree"]
-                    val = row[col_idx[col]]
-                    if val not in tree:
-                        tree[val] = []
-                    tree[val].append(rid)
+        if deleted and table_name in self.index:
+            self._unindex_deleted(table_name, original, deleted)
 
         self.storage_manager.save_db()
         self.storage_manager.save_index()
@@ -305,74 +667,101 @@ class DMLManager:
 
         table_columns = self.db["COLUMNS"][table_name]
         data = self.db["DATA"][table_name]
-        col_names = list(table_columns.keys())
-        col_idx = {c: i for i, c in enumerate(col_names)}
+        schema = self.storage_manager.schema(table_name)
+        col_names, col_idx = schema.col_names, schema.col_idx
         primary_key = self.db["TABLES"][table_name].get("primary_key")
 
-        where_fn = _make_where_fn(where, col_names)
+        where_fn = self._row_where_fn(where, schema)
 
-        updated_pks = set()
-        existing_pks = {row[col_idx[primary_key]] for row in data}
+        for col in updates:
+            if col not in table_columns:
+                raise ValueError(
+                    f"Column '{col}' does not exist in table '{table_name}'"
+                )
+        targets = [(col_idx[col], new_value) for col, new_value in updates.items()]
+        pk_index = col_idx.get(primary_key)
 
-        for idx, row in enumerate(data):
-            if where_fn is None or where_fn(row):
+        # Build every updated row once and check primary keys before any
+        # row is written, so a duplicate leaves the table unchanged
+        updated_pks = set()
+        existing_pks = None
+        changes = []
+        matched = self._bitmap_row_ids(table_name, where)
+        if matched is not None:
+            candidates = ((idx, data[idx]) for idx in matched)
+        else:
+            candidates = enumerate(data)
+        for idx, row in candidates:
+            if matched is not None or where_fn(row):
                 new_row = row.copy()
-                for col, new_value in updates.items():
-                    if col not in table_columns:
-                        raise ValueError(
-                            f"Column '{col}' does not exist in table '{table_name}'"
-                        )
-                    ci = col_idx[col]
+                for ci, new_value in targets:
                     new_row[ci] = (
                         new_value(new_row[ci]) if callable(new_value) else new_value
                     )
 
-                if primary_key:
-                    new_pk = new_row[col_idx[primary_key]]
-                    old_pk = row[col_idx[primary_key]]
+                if pk_index is not None:
+                    new_pk = new_row[pk_index]
+                    old_pk = row[pk_index]
 
                     if new_pk != old_pk:
+                        if existing_pks is None:
+                            existing_pks = {r[pk_index] for r in data}
                         if new_pk in existing_pks or new_pk in updated_pks:
                             raise ValueError(
                                 f"Duplicate primary key '{new_pk}' after update."
                             )
                         updated_pks.add(new_pk)
 
-        update_count = 0
-        for idx, row in enumerate(data):
-            if where_fn is None or where_fn(row):
-                new_row = row.copy()
-                for col, new_value in updates.items():
-                    ci = col_idx[col]
-                    new_row[ci] = (
-                        new_value(new_row[ci]) if callable(new_value) else new_value
-                    )
-                data[idx] = new_row
-                update_count += 1
-
-        if table_name in self.index:
+                changes.append((idx, new_row))
 
-            for col, info in list(self.index[table_name].items()):
-                name = (
-                    info.get("name", f"{table_name}_{col}_idx")
-                    if isinstance(info, dict)
-                    else f"{table_name}_{col}_idx"
-                )
-                self.index[table_name][col] = {"tree": OOBTree(), "name": name}
+        # Only indexes on columns whose value changed are touched
+        table_index = [
+            (col_idx[col], info["tree"])
+            for col, info in self.index.get(table_name, {}).items()
+        ]
 
-            for rid, row in enumerate(data):
-                for col, info in self.index[table_name].items():
-                    tree = info["tree"]
-                    val = row[col_idx[col]]
-                    if val not in tree:
-                        tree[val] = []
-                    tree[val].append(rid)
+        for idx, new_row in changes:
+            row = data[idx]
+            for ci, tree in table_index:
+                if new_row[ci] != row[ci]:
+                    _index_remove(tree, row[ci], idx)
+                    _index_add(tree, new_row[ci], idx)
+            data[idx] = new_row
+        update_count = len(changes)
+        self.storage_manager.invalidate_columns(table_name)
 
         self.storage_manager.save_db()
         self.storage_manager.save_index()
 
         return update_count
 
+    def _unindex_deleted(self, table_name, original, deleted):
+        """
+        Drop the deleted row ids from the table's indexes, then shift the ids
+        of the rows that moved up in DATA to fill the gaps.
+        """
+        col_idx = self.storage_manager.schema(table_name).col_idx
+        first = deleted[0]
+        tail_only = deleted[-1] == len(original) - 1 and (
+            deleted[-1] - first + 1 == len(deleted)
+        )
+
+        for col, info in self.index[table_name].items():
+            tree = info["tree"]
+            if len(deleted) == len(original):
+                tree.clear()
+                continue
+
+            ci = col_idx[col]
+            for rid in deleted:
+                _index_remove(tree, original[rid][ci], rid)
+            if tail_only:
+                continue
+
+            for rids in tree.values():
+                if rids[-1] > first:
+                    rids[:] = PostingList(r - bisect.bisect_left(deleted, r) for r in rids)
+
     def select_join_with_index(
         self,
         left_table,
@@ -404,57 +793,119 @@ class DMLManager:
             else:
                 left_alias, right_alias = left_table, right_table
 
-        Lcols, Rcols = list(self.db["COLUMNS"][left_table].keys()), list(self.db["COLUMNS"][right_table].keys())
+        Lschema, Rschema = self.storage_manager.schema(left_table), self.storage_manager.schema(right_table)
+        Lcols, Rcols = Lschema.col_names, Rschema.col_names
         Ldata, Rdata = self.db["DATA"][left_table], self.db["DATA"][right_table]
-        Li, Ri = Lcols.index(left_join_col), Rcols.index(right_join_col)
+        Li, Ri = Lschema.col_idx[left_join_col], Rschema.col_idx[right_join_col]
+
+        # Pick the inner (probed) side: a table indexed on its join column is
+        # probed through its tree, the larger one if both are. Without any
+        # index the hash table is built on the smaller table.
+        left_has_idx = left_join_col in self.index.get(left_table, {})
+        right_has_idx = right_join_col in self.index.get(right_table, {})
+        if left_has_idx != right_has_idx:
+            right_inner = right_has_idx
+        elif left_has_idx:
+            right_inner = len(Ldata) <= len(Rdata)
+        else:
+            right_inner = len(Rdata) <= len(Ldata)
+
+        # Results keep the order of the smaller table whichever side is
+        # probed, so they are re-sorted on its row ids when it ended up inner
+        restore_order = right_inner != (len(Ldata) <= len(Rdata))
 
-        # Determine which table has fewer rows and set it as the outer data (to minimize the number of iterations)
-        if len(Ldata) <= len(Rdata):
+        if right_inner:
             outer_data, outer_cols, outer_alias, outer_idx = Ldata, Lcols, left_alias, Li
             inner_data, inner_cols, inner_alias, inner_idx = Rdata, Rcols, right_alias, Ri
+            inner_table, inner_join_col = right_table, right_join_col
         else:
             outer_data, outer_cols, outer_alias, outer_idx = Rdata, Rcols, right_alias, Ri
             inner_data, inner_cols, inner_alias, inner_idx = Ldata, Lcols, left_alias, Li
+            inner_table, inner_join_col = left_table, left_join_col
+
+        # Probe the inner table's index per outer row if it has one, else
+        # hash the inner table on its join column
+        inner_index = self.index.get(inner_table, {}).get(inner_join_col)
+        if inner_index is not None:
+            inner_tree = inner_index["tree"]
+
+            def inner_rows(key):
+                try:
+                    rids = inner_tree.get(key)
+                except TypeError:  # key not comparable with the index keys
+                    return ()
+                return [(rid, inner_data[rid]) for rid in rids] if rids else ()
 
-        # Use index for the inner table if available
-        inner_index = defaultdict(list)
-        if right_join_col in self.index.get(right_table, {}):
-            # Use index for inner table (if available)
-            inner_index_tree = self.index[right_table][right_join_col]["tree"]
-            for key, row_ids in inner_index_tree.items():
-                for row_id in row_ids:
-                    inner_index[key].append(Rdata[row_id])
         else:
-            # Fall back to scanning the entire inner table if no index exists
-            for row in inner_data:
-                key = row[inner_idx]
-                inner_index[key].append(row)
+            inner_hash = defaultdict(list)
+            for rid, row in enumerate(inner_data):
+                inner_hash[row[inner_idx]].append((rid, row))
+
+            def inner_rows(key):
+                return inner_hash.get(key, ())
+
+        outer_pos = {f"{outer_alias}.{c}": i for i, c in enumerate(outer_cols)}
+        inner_pos = {f"{inner_alias}.{c}": i for i, c in enumerate(inner_cols)}
 
         # Prepare the where function if applicable
         if callable(where):
             match_fn = where
         else:
+            where = self._qualify_join_where(where, outer_pos, inner_pos)
             qualified = [f"{outer_alias}.{c}" for c in outer_cols] + [f"{inner_alias}.{c}" for c in inner_cols]
             match_fn = _make_where_fn(where, qualified)
 
+        # Evaluate the where on the raw row pair when possible, so the joined
+        # dict is only built for pairs that pass
+        pair_fn = self._join_pair_fn(where, outer_pos, inner_pos)
+
+        # Resolve the output columns to (key, side, position) once, side 0
+        # being the outer row and 1 the inner row
+        if columns is None:
+            # Left table's columns first, whichever side is probed
+            outer_cols_out = [(k, 0, i) for k, i in outer_pos.items()]
+            inner_cols_out = [(k, 1, i) for k, i in inner_pos.items()]
+            if right_inner:
+                out_cols = outer_cols_out + inner_cols_out
+            else:
+                out_cols = inner_cols_out + outer_cols_out
+        else:
+            out_cols = []
+            for c in columns:
+                if c in inner_pos:
+                    out_cols.append((c, 1, inner_pos[c]))
+                elif c in outer_pos:
+                    out_cols.append((c, 0, outer_pos[c]))
+
+        # A where that cannot be pushed down needs every column of the pair
+        full_row = pair_fn is None and where is not None
+
         # Perform the join using the inner index (or full scan if no index exists)
         results = []
+        order_keys = []
         for o_row in outer_data:
             key = o_row[outer_idx]
-            for i_row in inner_index.get(key, []):
-                j = {}
-                for i, col in enumerate(outer_cols):
-                    j[f"{outer_alias}.{col}"] = o_row[i]
-                for i, col in enumerate(inner_cols):
-                    j[f"{inner_alias}.{col}"] = i_row[i]
-
-                if not match_fn(j):
+            for i_rid, i_row in inner_rows(key):
+                if pair_fn is not None and not pair_fn(o_row, i_row):
                     continue
 
-                if columns is None:
-                    results.append(j)
-                else:
-                    results.append({c: j[c] for c in columns if c in j})
+                if full_row:
+                    j = {}
+                    for i, col in enumerate(outer_cols):
+                        j[f"{outer_alias}.{col}"] = o_row[i]
+                    for i, col in enumerate(inner_cols):
+                        j[f"{inner_alias}.{col}"] = i_row[i]
+                    if not match_fn(j):
+                        continue
+
+                pair = (o_row, i_row)
+                results.append({k: pair[side][i] for k, side, i in out_cols})
+                if restore_order:
+                    order_keys.append(i_rid)
+
+        if restore_order:
+            order = sorted(range(len(results)), key=order_keys.__getitem__)
+            results = [results[k] for k in order]
 
         # Handle group by and aggregation
         if group_by is not None:
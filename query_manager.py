@@ -1,8 +1,9 @@
+from functools import lru_cache
+import re
+import sys
+
 from pyparsing import (
     CaselessKeyword,
-    Word,
-    alphas,
-    alphanums,
     delimitedList,
     Group,
     Optional,
@@ -11,51 +12,123 @@ from pyparsing import (
     quotedString,
     removeQuotes,
     Suppress,
-    nums,
-    Combine,
     OneOrMore,
     ZeroOrMore,
     Literal,
+    Regex,
+    StringEnd,
+    Token,
 )
-from pyparsing import ParseResults
+from pyparsing import ParseBaseException, ParseException, ParseResults
 from ddl_manager import DDLManager
 from dml_manager import DMLManager
 from storage_manager import StorageManager
-from utils import ASC, DESC, MAX, MIN, SUM, track_time
+from utils import ASC, AVG, COUNT, DESC, MAX, MIN, SUM, track_time
+from utils import _CMP_OPS, _SRC_OPS, compile_where
+
+
+class _KeywordDispatch(Token):
+    """Match the statement grammar picked by the input's leading keyword,
+    instead of trying every statement grammar in turn"""
+
+    def __init__(self, statements):
+        super().__init__()
+        self.statements = statements
+        self.mayReturnEmpty = False
+        self.setName("one of " + ", ".join(statements))
+
+    def streamline(self):
+        super().streamline()
+        for stmt in self.statements.values():
+            stmt.streamline()
+        return self
+
+    def recurse(self):
+        return list(self.statements.values())
+
+    def parseImpl(self, instring, loc, do_actions=True):
+        end = loc
+        while end < len(instring) and instring[end].isalpha():
+            end += 1
+        stmt = self.statements.get(instring[loc:end].upper())
+        if stmt is None:
+            raise ParseException(instring, loc, self.errmsg, self)
+        # Not caught: a failing statement raises its own, furthest, error
+        return stmt._parse(instring, loc, do_actions)
+
+
+def _keyword_set(words):
+    """Match any one of several keywords, case-insensitively, with a single
+    regex instead of trying a CaselessKeyword per word. The match is returned
+    as the word object itself, as CaselessKeyword returns its own spelling."""
+    spelling = {word.upper(): word for word in words}
+    return (
+        Regex(r"(?i)(?:%s)\b" % "|".join(words))
+        .setParseAction(lambda t: spelling[t[0].upper()])
+        .setName(" | ".join(words))
+    )
+
+
+# Integer or real literal, as the grammar and the fast paths accept it
+_NUMBER = r"[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?"
+
+# Clause keywords of the grammar
+_KEYWORDS = tuple(
+    """
+    SELECT FROM WHERE GROUP BY ORDER INSERT INTO VALUES JOIN ON
+    CREATE DROP INDEX TABLE PRIMARY KEY FOREIGN REFERENCES DELETE UPDATE SET HAVING
+    """.split()
+)
+# A table or column name, which may not be a clause keyword or AND/OR, so
+# SELECT * FROM WHERE is an error rather than a table named WHERE
+_IDENTIFIER = r"(?!(?i:%s)\b)[^\W\d]\w*" % "|".join(_KEYWORDS + ("AND", "OR"))
+_QUALIFIED_IDENTIFIER = _IDENTIFIER + r"(?:\.[^\W\d]\w*)*"
 
 
-class QueryManager:
-    def __init__(self, storage_manager, ddl_manager, dml_manager):
-        self.storage_manager = storage_manager
-        self.ddl_manager = ddl_manager
-        self.dml_manager = dml_manager
-        self.identifier = Word(alphas, alphanums + "_").setName("identifier")
-        self.qualified_identifier = Combine(
-            self.identifier + ZeroOrMore("." + self.identifier)
+def _to_number(t):
+    """Parse action typing a numeric literal, int unless it has a fraction
+    or an exponent"""
+    text = t[0]
+    if "." in text or "e" in text or "E" in text:
+        return float(text)
+    return int(text)
+
+
+def _interned(t):
+    """Parse action interning a name, so the table and column dict lookups
+    it is used in compare it by identity"""
+    return sys.intern(t[0])
+
+
+class _SqlGrammar:
+    """The SQL grammar, built once at import and shared by every QueryManager"""
+
+    def __init__(self):
+        # Terminals are single regexes that already convert their tokens, so
+        # each literal or name costs one match call
+        self.identifier = (
+            Regex(_IDENTIFIER).setParseAction(_interned).setName("identifier")
+        )
+        self.qualified_identifier = (
+            Regex(_QUALIFIED_IDENTIFIER)
+            .setParseAction(_interned)
+            .setName("qualified_identifier")
         )
 
-        integer = Word(nums).setParseAction(lambda t: int(t[0]))
-        float_literal = Combine(
-            Optional(oneOf("+ -")) + Word(nums) + "." + Word(nums)
-        ).setParseAction(lambda t: float(t[0]))
-        self.numeric_literal = float_literal | Combine(Optional(oneOf("+ -")) + integer)
-        # self.numeric_literal = Combine(Optional(oneOf("+ -")) + integer)
+        # Integers and reals in one regex, so an integer is not first tried
+        # as a real
+        self.numeric_literal = (
+            Regex(_NUMBER)
+            .setParseAction(_to_number)
+            .setName("numeric_literal")
+        )
         self.string_literal = quotedString.setParseAction(removeQuotes)
        
-        self.constant = float_literal | integer | self.string_literal
+        self.constant = self.numeric_literal | self.string_literal
      
-        self.ASC = CaselessKeyword("ASC")
-        self.DESC = CaselessKeyword("DESC")
-
         star = Literal("*").setName("star")
         agg_func = Group(
-            (
-                CaselessKeyword("MIN")
-                | CaselessKeyword("MAX")
-                | CaselessKeyword("SUM")
-                | CaselessKeyword("AVG")
-                | CaselessKeyword("COUNT")
-            )("func")
+            _keyword_set(["MIN", "MAX", "SUM", "AVG", "COUNT"])("func")
             + Suppress("(")
             + (self.qualified_identifier | star)("col")
             + Suppress(")")
@@ -63,7 +136,7 @@ class QueryManager:
 
         order_spec = Group(
             self.qualified_identifier("col")
-            + Optional(self.ASC("dir") | self.DESC("dir"))
+            + Optional(_keyword_set(["ASC", "DESC"])("dir"))
         )
 
         (
@@ -90,20 +163,18 @@ class QueryManager:
             self.UPDATE,
             self.SET,
             self.HAVING,
-        ) = map(
-            CaselessKeyword,
-            """
-            SELECT FROM WHERE GROUP BY ORDER INSERT INTO VALUES JOIN ON
-            CREATE DROP INDEX TABLE PRIMARY KEY FOREIGN REFERENCES DELETE UPDATE SET HAVING
-            """.split(),
-        )
+        ) = map(CaselessKeyword, _KEYWORDS)
 
         self.column_name = self.qualified_identifier
         self.column_list = Group(delimitedList(self.column_name))
         self.table_name = self.identifier
 
+        # Join columns are looked up unqualified, the table part is dropped
+        join_column = self.qualified_identifier.copy().setParseAction(
+            lambda t: sys.intern(t[0].rpartition(".")[2])
+        )
         self.join_condition = Group(
-            self.ON + self.qualified_identifier + "=" + self.qualified_identifier
+            self.ON + join_column("left_col") + "=" + join_column("right_col")
         )
         self.join_clause = Group(self.JOIN + self.table_name + self.join_condition)
         self.table_with_joins = Group(
@@ -112,8 +183,6 @@ class QueryManager:
 
         self.select_stmt = Forward()
 
-        self.condition = Forward()
-
         identifier_or_agg = agg_func | self.qualified_identifier
         value_expr = self.constant | identifier_or_agg
 
@@ -122,21 +191,24 @@ class QueryManager:
             + oneOf("= > < >= <=")("operator")
             + value_expr("right")
         )
-        # Allow chaining of simple_condition via AND/OR recursively
-        self.condition <<= self.simple_condition + ZeroOrMore(
-            (CaselessKeyword("AND") | CaselessKeyword("OR"))("logic") + self.condition
+        # Chain simple_conditions via AND/OR as one flat, left-to-right list
+        self.condition = self.simple_condition + ZeroOrMore(
+            _keyword_set(["AND", "OR"])("logic")
+            + self.simple_condition
         )
 
-        # Combine the WHERE keyword with the full recursive condition
+        # Combine the WHERE keyword with the full condition
         self.where_condition = Group(self.WHERE + self.condition)("where")
         # --- Multi-condition WHERE support ends ---
-        self.group_by_clause = Group(self.GROUP + self.BY + self.column_list)
+        self.group_by_clause = Group(self.GROUP + self.BY + self.column_list)(
+            "group_by"
+        )
         self.having_clause = Group(self.HAVING + self.condition).setResultsName(
             "having"
         )
         self.order_by_clause = Group(
             self.ORDER + self.BY + delimitedList(order_spec)("order_specs")
-        )
+        )("order_by")
 
         select_list = (
             Group(delimitedList(agg_func | self.qualified_identifier))("select_cols")
@@ -169,15 +241,6 @@ class QueryManager:
             + Suppress(")")
         )
 
-        self.create_index_stmt = self.CREATE + self.INDEX + self.identifier(
-            "index_name"
-        ) + self.FROM.suppress() ^ (
-            self.CREATE
-            + self.INDEX
-            + self.identifier("index_name")
-            + self.table_name("on_table")
-        )
-
         self.create_index_stmt = (
             self.CREATE
             + self.INDEX
@@ -196,10 +259,7 @@ class QueryManager:
             + Optional(CaselessKeyword("ON") + self.table_name("on_table"))
         )
 
-        self.double_type = CaselessKeyword("double")
-        self.int_type = CaselessKeyword("int")
-        self.string_type = CaselessKeyword("string")
-        self.column_type = self.int_type | self.string_type | self.double_type
+        self.column_type = _keyword_set(["int", "string", "double"])
 
         self.primary_key_clause = Group(self.PRIMARY + self.KEY)
 
@@ -254,93 +314,222 @@ class QueryManager:
             + Optional(self.where_condition("where"))  # 支持可选的 WHERE 子句
         )
 
-        self.sql_stmt = (
-            self.select_stmt("select")
-            | self.insert_stmt("insert")
-            | self.create_index_stmt("create_index")
-            | self.drop_index_stmt("drop_index")
-            | self.create_table_stmt("create_table")
-            | self.drop_table_stmt("drop_table")
-            | self.delete_stmt("delete")
-            | self.update_stmt("update")
+        self.sql_stmt = _KeywordDispatch(
+            {
+                "SELECT": self.select_stmt("select"),
+                "INSERT": self.insert_stmt("insert"),
+                "CREATE": self.create_index_stmt("create_index")
+                | self.create_table_stmt("create_table"),
+                "DROP": self.drop_index_stmt("drop_index")
+                | self.drop_table_stmt("drop_table"),
+                "DELETE": self.delete_stmt("delete"),
+                "UPDATE": self.update_stmt("update"),
+            }
         )
 
-    def parse_query(self, queries: str):
+        # A whole ';'-separated script in one pass; each statement is grouped
+        # so it keeps its own results names. Past a separator that is not the
+        # last, a statement is required ('-'), so a bad statement reports its
+        # own error instead of "Expected end of text" at its start.
+        separator = OneOrMore(Suppress(";"))
+        self.sql_script = (
+            Optional(separator)
+            + Group(self.sql_stmt)
+            + ZeroOrMore(separator + ~StringEnd() - Group(self.sql_stmt))
+            + Optional(separator)
+        )
+
+
+_SQL_GRAMMAR = _SqlGrammar()
 
-        statements = [stmt.strip() for stmt in queries.split(";") if stmt.strip()]
-        results = []
-        for stmt in statements:
-            try:
-                parsed_result = self.sql_stmt.parseString(stmt, parseAll=True)
-                results.append(parsed_result)
-            except Exception as e:
-                raise Exception(
-                    f"Query parsing error in statement '{stmt}': {e}"
-                ) from e
-        return results
+
+# Lone statements simple enough to be parsed without the grammar
+# A constant, quoted strings as quotedString takes them
+_FAST_LITERAL = (
+    r"""(%s)|'((?:[^'\n\r\\]|''|\\(?:[^x]|x[0-9a-fA-F]+))*)'"""
+    r'|"((?:[^"\n\r\\]|""|\\(?:[^x]|x[0-9a-fA-F]+))*)"' % _NUMBER
+)
+_FAST_SELECT_ALL = re.compile(
+    r"SELECT\s+\*\s+FROM\s+(%s)" % _IDENTIFIER
+    + r"(?:\s+WHERE\s+(%s)\s*(>=|<=|=|>|<)\s*(?:%s))?\s*;?"
+    % (_QUALIFIED_IDENTIFIER, _FAST_LITERAL),
+    re.I,
+)
+_FAST_INSERT = re.compile(
+    r"INSERT\s+INTO\s+(%s)\s+VALUES\s*\((.*)\)\s*;?" % _IDENTIFIER,
+    re.I | re.S,
+)
+# One VALUES item and the ',' after it
+_FAST_VALUE = re.compile(r"\s*(?:%s)\s*(,|\Z)" % _FAST_LITERAL)
+
+
+def _fast_literal(number, single, double):
+    """The constant matched by the groups of _FAST_LITERAL"""
+    if number is not None:
+        return _to_number([number])
+    return single if single is not None else double
+
+
+def _fast_statement(stmt):
+    """The parse of a lone SELECT * FROM t, optionally with a single
+    WHERE col op constant, or INSERT INTO t VALUES (...), built the way the
+    grammar would, or None for any other statement"""
+    match = _FAST_SELECT_ALL.fullmatch(stmt)
+    if match:
+        table, col, op = match.group(1, 2, 3)
+        parsed = ParseResults(["SELECT", "*", "FROM", ParseResults([sys.intern(table)])])
+        if col is not None:
+            col = sys.intern(col)
+            val = _fast_literal(*match.group(4, 5, 6))
+            where = ParseResults(["WHERE", ParseResults([col, op, val])])
+            parsed.append(where)
+            parsed["where"] = where
+        return parsed
+
+    match = _FAST_INSERT.fullmatch(stmt)
+    if match is None:
+        return None
+    text, pos, values = match[2], 0, []
+    while True:
+        item = _FAST_VALUE.match(text, pos)
+        if item is None:
+            return None
+        values.append(_fast_literal(*item.group(1, 2, 3)))
+        pos = item.end()
+        if not item[4]:
+            break
+
+    table = sys.intern(match[1])
+    values = ParseResults(values)
+    parsed = ParseResults(["INSERT", "INTO", table, "VALUES", values])
+    parsed["table"] = table
+    parsed["values"] = values
+    return parsed
+
+
+@lru_cache(maxsize=512)
+def _parse_script(queries):
+    """Parse a query script into a tuple of statements, cached by its text so
+    repeated queries skip the grammar; the results are only ever read"""
+    fast = _fast_statement(queries)
+    if fast is not None:
+        return (fast,)
+    if not queries.strip("; \t\r\n"):
+        return ()
+    try:
+        return tuple(_SQL_GRAMMAR.sql_script.parse_string(queries, parse_all=True))
+    except ParseBaseException as e:
+        # The error is located inside the failing statement, report that
+        # statement as the caller wrote it
+        start = queries.rfind(";", 0, e.loc) + 1
+        end = queries.find(";", e.loc)
+        stmt = queries[start : end if end != -1 else len(queries)].strip()
+        raise Exception(f"Query parsing error in statement '{stmt}': {e}") from e
+
+
+# Aggregate keyword, as the grammar returns it, to the DML aggregate name
+_AGG_FUNCS = {"MAX": MAX, "MIN": MIN, "SUM": SUM, "COUNT": COUNT, "AVG": AVG}
+
+
+class QueryManager:
+    # Shared by every instance, the grammar is built once at import
+    grammar = _SQL_GRAMMAR
+    sql_stmt = _SQL_GRAMMAR.sql_stmt
+
+    # Only the managers are per instance
+    __slots__ = ("storage_manager", "ddl_manager", "dml_manager")
+
+    def __init__(self, storage_manager, ddl_manager, dml_manager):
+        self.storage_manager = storage_manager
+        self.ddl_manager = ddl_manager
+        self.dml_manager = dml_manager
+
+    def parse_query(self, queries: str):
+        return list(_parse_script(queries.strip()))
 
     def _build_condition_fn(self, tokens):
         """
-        Recursively build a filter function f(row_dict)->bool from tokens,
-        where tokens is either:
+        Build a filter function f(row_dict)->bool from tokens, where tokens
+        is either:
           - ['col', 'op', val]        (simple condition)
-          - [simple_cond, logic, sub, ...] (chained)
+          - [simple_cond, logic, simple_cond, ...] (chained, left to right)
         """
-     
-        if len(tokens) == 3 and isinstance(tokens[0], str):
-            simple = tokens  # ['col', 'op', raw]
-            rest = []
-        else:
-          
-            simple = tokens[0]
-            rest = tokens[1:]
-
-        # Extract column, operator, raw value
-        col, op, raw = simple[0], simple[1], simple[2]
-        if isinstance(col, ParseResults):
-            # func_name, col_name = col[0], col[1]
-            col = col[1]    
-        val = raw
-   
-        if op == "=":
-            funcs = [lambda row, c=col, v=val: row.get(c) == v]
-        elif op == "!=":
-            funcs = [lambda row, c=col, v=val: row.get(c) != v]
-        elif op == "<":
-            funcs = [lambda row, c=col, v=val: row.get(c) < v]
-        elif op == ">":
-            funcs = [lambda row, c=col, v=val: row.get(c) > v]
-        elif op == "<=":
-            funcs = [lambda row, c=col, v=val: row.get(c) <= v]
-        elif op == ">=":
-            funcs = [lambda row, c=col, v=val: row.get(c) >= v]
-        else:
-            raise Exception(f"Unsupported operator: {op}")
-
-        # Now handle any chained (logic, subcondition) in rest
-        ops = []
-        idx = 0
-        while idx < len(rest):
-            logic = rest[idx].upper()  # "AND"/"OR"
-            sub = rest[idx + 1]
-            ops.append(logic)
-            funcs.append(self._build_condition_fn(sub))
-            idx += 2
-
-        # Combine all funcs by AND/OR
-        def where_fn(row):
-            res = funcs[0](row)
-            for logic, f in zip(ops, funcs[1:]):
-                if logic == "AND":
-                    res = res and f(row)
-                else:
-                    res = res or f(row)
-            return res
+        if len(tokens) == 3 and tokens[1] in _SRC_OPS:
+            tokens = [tokens]
 
+        where, cols = None, []
+        for pos, tok in enumerate(tokens):
+            if pos % 2:
+                logic = tok  # "AND"/"OR"
+                continue
+            col, op, val = tok[0], tok[1], tok[2]
+            if isinstance(col, ParseResults):
+                col = col[1]  # [func_name, col_name]
+            if op not in _SRC_OPS:
+                raise Exception(f"Unsupported operator: {op}")
+            cond = [col, op, val]
+            where = cond if pos == 0 else {"op": logic, "left": where, "right": cond}
+            cols.append(col)
+
+        # Rows are dicts keyed by column name, so each column is its own key
+        where_fn = compile_where(where, {col: col for col in cols})
+        # Columns read by the condition, lets joins evaluate it before
+        # building the full joined row
+        where_fn.columns = tuple(cols)
         return where_fn
 
+    def _resolve_column(self, table, col):
+        """
+        The schema name of a WHERE column of `table`, written bare or
+        qualified as table.col. Raises ValueError for a column the table
+        does not have. Left as written for joins and unknown tables, which
+        the DML reports on its own.
+        """
+        if table is None or table not in self.storage_manager.db["COLUMNS"]:
+            return col
+        col_idx = self.storage_manager.schema(table).col_idx
+        if col in col_idx:
+            return col
+        prefix, _, name = col.rpartition(".")
+        if prefix == table and name in col_idx:
+            return name
+        raise ValueError(f"Column '{col}' does not exist in table '{table}'")
+
+    def _build_where(self, where_parse, table=None):
+        """
+        The where handed to the DML layer. A condition made only of
+        column-versus-constant comparisons becomes the DML's list/dict form,
+        e.g. WHERE a > 1 AND b = 'x' OR c < 2 gives
+        {"op": "OR", "left": {"op": "AND", ...}, "right": ["c", "<", 2]},
+        which the DML answers from indexes or vectorized column scans.
+        Anything else gets the compiled row predicate. `table` is the one
+        table the statement reads, its columns are checked against it.
+        """
+        tokens = where_parse[1:]
+        where = None
+        for pos, tok in enumerate(tokens):
+            if pos % 2:
+                logic = tok
+                continue
+            col, op, val = tok[0], tok[1], tok[2]
+            if op not in _CMP_OPS or not isinstance(col, str):
+                return self._build_where_fn(where_parse)
+            col = self._resolve_column(table, col)
+            if not isinstance(val, (str, int, float)):
+                return self._build_where_fn(where_parse)
+            cond = [col, op, val]
+            where = cond if pos == 0 else {"op": logic, "left": where, "right": cond}
+        return where
+
+    @staticmethod
+    def _where_table(parsed):
+        """The one table a statement's WHERE reads, None for a join"""
+        if parsed[0] == "SELECT":
+            from_clause = parsed[3]
+            return from_clause[0] if len(from_clause) == 1 else None
+        return parsed.get("table")
+
     def _build_where_fn(self, where_parse):
-        # print(where_parse)
         cond_tokens = where_parse[1:]
         return self._build_condition_fn(cond_tokens)
 
@@ -350,192 +539,161 @@ class QueryManager:
         parsed_queries = self.parse_query(query)
 
         for parsed in parsed_queries:
-            cmd = parsed[0].upper()
+            cmd = parsed[0]
+            handler = self._HANDLERS.get(cmd)
+            if handler is None:
+                raise Exception(f"Unsupported SQL command: {cmd}")
+            # Built once here, SELECT, DELETE and UPDATE all use it
             where_tok = parsed.get("where")
-            base_where_fn = self._build_where_fn(where_tok) if where_tok else None
-            # ----- CREATE -----
-            if cmd == "CREATE":
-                # CREATE TABLE
-                if parsed[1].upper() == "TABLE":
-                    table_name, raw_cols = parsed[2:4]
-                    cols = []
-                    pk = None
-                    fks = []
-                    # Extract column defs, PK and FK
-                    for col in raw_cols:
-                        name, ctype = col[0], col[1]
-                        cols.append((name, ctype))
-                        constraints = col[2] if len(col) > 2 else []
-                        if "PRIMARY KEY" in " ".join(constraints):
-                            pk = name
-                        if any("FOREIGN" in c for c in constraints) and any(
-                            "KEY" in c for c in constraints
-                        ):
-                            ref_table = constraints[3]
-                            ref_col = constraints[4]
-                            fks.append((name, ref_table, ref_col))
-                    self.ddl_manager.create_table(table_name, cols, pk, fks)
-
-                # CREATE INDEX
-                elif parsed[1].upper() == "INDEX":
-                    idx_name = parsed[2]
-                    tbl = parsed[4]
-                    col = parsed[5][0]
-                    self.ddl_manager.create_index(tbl, col, idx_name)
-                continue
-
-            # ----- DROP -----
-            elif cmd == "DROP":
-                # DROP TABLE
-                if parsed[1].upper() == "TABLE":
-                    tbl = parsed[2]
-                    self.ddl_manager.drop_table(tbl)
-                # DROP INDEX
-                elif parsed[1].upper() == "INDEX":
-                    idx_name = parsed[2]
-                    self.ddl_manager.drop_index(idx_name)
-                continue
-
-            # ----- INSERT -----
-            elif cmd == "INSERT":
-                tbl = parsed[2]
-                raw_vals = parsed.get("values") or []
-                vals = []
-                for v in raw_vals:
-                    vals.append(v)
-                self.dml_manager.insert(tbl, vals)
-                continue
-
-            # ----- SELECT -----
-            elif cmd == "SELECT":
-                print(parsed)
-                sel = parsed[1]
-                from_clause = parsed[3]
-                left_tbl = from_clause[0]
-                # Build where function if present
-                where_tok = parsed.get("where")
-                where_fn = self._build_where_fn(where_tok) if where_tok else None
-
-                # Get order by tuples
-                order_tok = None
-                order_tuples = None
-                for tok in parsed:
-                    if (
-                        len(tok) >= 2
-                        and tok[0].upper() == "ORDER"
-                        and tok[1].upper() == "BY"
-                    ):
-                        order_tok = tok
-                        break
-                if order_tok:
-                    order_tuples = [
-                        (col, DESC if direction.upper() == "DESC" else ASC)
-                        for col, direction in order_tok[2:]
-                    ]
-
-                # Get group by
-                group_tok = None
-                group_by_col = []
-                for tok in parsed:
-                    if (
-                        len(tok) >= 2
-                        and tok[0].upper() == "GROUP"
-                        and tok[1].upper() == "BY"
-                    ):
-                        group_tok = tok
-                        break
-                if group_tok:
-                    for cols in group_tok[2]:
-                        group_by_col.append(cols)
-
-                # Get cols and aggregation
-                cols = None if sel == "*" else []
-                agg_func = []
-
-                aggregation_function_map = {
-                    "max": MAX,
-                    "min": MIN,
-                    "sum": SUM,
-                }
-
-                # Look for aggregation functions in the list of selected columns
-                if cols is not None:
-                    for tok in sel:
-                        if isinstance(tok, str):
-                            cols.append(tok)
-                        elif tok[0].lower() in aggregation_function_map:
-                            agg_func.append(
-                                {aggregation_function_map[tok[0].lower()]: tok[1]}
-                            )
-                            cols.append(tok[1])
-
-                having_tok = parsed.get("having")
-                having_fn = self._build_where_fn(having_tok) if having_tok else None
-
-                # Check for JOIN
-                if len(from_clause) > 1:
-                    join = from_clause[1]
-                    right_tbl = join[1]
-                    cond = join[2]
-                    left_col = cond[1].split(".")[-1]
-                    right_col = cond[3].split(".")[-1]
-                    result = self.dml_manager.select_join_with_index(
-                        left_table=left_tbl,
-                        right_table=right_tbl,
-                        left_join_col=left_col,
-                        right_join_col=right_col,
-                        columns=cols,
-                        where=where_fn,
-                        order_by=order_tuples,
-                        group_by=group_by_col if group_tok else None,
-                        aggregates=agg_func if len(agg_func) > 0 else None,
-                        having=having_fn,
-                    )
-                else:
-                    result = self.dml_manager.select(
-                        table_name=left_tbl,
-                        columns=cols,
-                        where=where_fn,
-                        order_by=order_tuples,
-                        group_by=group_by_col if group_tok else None,
-                        aggregates=agg_func if len(agg_func) > 0 else None,
-                        having=having_fn,
-                    )
+            where_fn = (
+                self._build_where(where_tok, self._where_table(parsed))
+                if where_tok
+                else None
+            )
+            # DDL and INSERT return None and the script carries on, the
+            # first SELECT, DELETE or UPDATE ends it with its result
+            result = handler(self, parsed, where_fn)
+            if result is not None:
                 return result
 
-            # ----- DELETE -----
-            elif cmd == "DELETE":
-                tbl = parsed["table"]
-                where_parse = parsed.get("where")
-                base_where_fn = (
-                    self._build_where_fn(where_parse) if where_parse else None
-                )
-                deleted_count = self.dml_manager.delete(tbl, base_where_fn)
-                # print(f"Deleted {deleted_count} rows from {tbl}.")
-                return deleted_count
-
-            # ----- UPDATE -----
-            elif cmd == "UPDATE":
-                tbl = parsed.get("table")
-                # Parse SET clauses
-                updates = {}
-                for u in parsed["updates"]:
-                    c, v = u["col"], u["val"]
-                    if isinstance(v, str) and v.isdigit():
-                        v = int(v)
-                    elif isinstance(v, str) and v.replace(".", "", 1).isdigit():
-                        v = float(v)
-                    updates[c] = v
-                # Build where function if present
-                where_tok = parsed.get("where")
-                where_fn = self._build_where_fn(where_tok) if where_tok else None
-                count = self.dml_manager.update(tbl, updates, where_fn)
-                # print(f"Updated {count} rows in {tbl}.")
-                return count
-
-            # Unsupported command
-            else:
-                raise Exception(f"Unsupported SQL command: {cmd}")
+    def _execute_create(self, parsed, where_fn):
+        # CREATE TABLE
+        if parsed[1] == "TABLE":
+            table_name, raw_cols = parsed[2:4]
+            cols = []
+            pk = None
+            fks = []
+            # Extract column defs, PK and FK
+            for col in raw_cols:
+                name, ctype = col[0], col[1]
+                cols.append((name, ctype))
+                if "pk" in col:
+                    pk = name
+                fk = col.get("fk")
+                if fk is not None:
+                    fks.append((name, fk["ref_table"], fk["ref_col"]))
+            self.ddl_manager.create_table(table_name, cols, pk, fks)
+
+        # CREATE INDEX
+        elif parsed[1] == "INDEX":
+            idx_name = parsed[2]
+            tbl = parsed[4]
+            col = parsed[5][0]
+            self.ddl_manager.create_index(tbl, col, idx_name)
+
+    def _execute_drop(self, parsed, where_fn):
+        # DROP TABLE
+        if parsed[1] == "TABLE":
+            tbl = parsed[2]
+            self.ddl_manager.drop_table(tbl)
+        # DROP INDEX
+        elif parsed[1] == "INDEX":
+            idx_name = parsed[2]
+            self.ddl_manager.drop_index(idx_name)
+
+    def _execute_insert(self, parsed, where_fn):
+        tbl = parsed[2]
+        # Values arrive typed from the grammar, only an integer literal for a
+        # DOUBLE column is widened, as 100 is written for 100.0
+        vals = list(parsed.get("values") or [])
+        if tbl in self.storage_manager.db["COLUMNS"]:
+            py_types = self.storage_manager.schema(tbl).py_types
+            if len(vals) == len(py_types):
+                vals = [
+                    float(v) if t is float and type(v) is int else v
+                    for v, t in zip(vals, py_types)
+                ]
+        self.dml_manager.insert(tbl, vals)
+
+    def _execute_select(self, parsed, where_fn):
+        sel = parsed[1]
+        from_clause = parsed[3]
+        left_tbl = from_clause[0]
+
+        # Get order by tuples
+        order_tok = parsed.get("order_by")
+        order_tuples = None
+        if order_tok:
+            order_tuples = [
+                (col, DESC if direction == "DESC" else ASC)
+                for col, direction in order_tok[2:]
+            ]
+
+        # Get group by
+        group_tok = parsed.get("group_by")
+        group_by_col = list(group_tok[2]) if group_tok else None
+
+        # Get cols and aggregation
+        cols = None if sel == "*" else []
+        agg_func = []
+
+        # Look for aggregation functions in the list of selected columns
+        if cols is not None:
+            for tok in sel:
+                if isinstance(tok, str):
+                    cols.append(tok)
+                elif tok[0] in _AGG_FUNCS:
+                    agg_func.append({_AGG_FUNCS[tok[0]]: tok[1]})
+                    if tok[1] != "*":
+                        cols.append(tok[1])
+
+        having_tok = parsed.get("having")
+        having_fn = self._build_where_fn(having_tok) if having_tok else None
+
+        # Check for JOIN
+        if len(from_clause) > 1:
+            join = from_clause[1]
+            right_tbl = join[1]
+            cond = join[2]
+            return self.dml_manager.select_join_with_index(
+                left_table=left_tbl,
+                right_table=right_tbl,
+                left_join_col=cond["left_col"],
+                right_join_col=cond["right_col"],
+                columns=cols,
+                where=where_fn,
+                order_by=order_tuples,
+                group_by=group_by_col,
+                aggregates=agg_func if len(agg_func) > 0 else None,
+                having=having_fn,
+            )
+        return self.dml_manager.select(
+            table_name=left_tbl,
+            columns=cols,
+            where=where_fn,
+            order_by=order_tuples,
+            group_by=group_by_col,
+            aggregates=agg_func if len(agg_func) > 0 else None,
+            having=having_fn,
+        )
+
+    def _execute_delete(self, parsed, where_fn):
+        tbl = parsed["table"]
+        deleted_count = self.dml_manager.delete(tbl, where_fn)
+        # print(f"Deleted {deleted_count} rows from {tbl}.")
+        return deleted_count
+
+    def _execute_update(self, parsed, where_fn):
+        tbl = parsed.get("table")
+        # Parse SET clauses
+        updates = {}
+        # Numeric constants are already int/float from the grammar,
+        # a quoted '42' stays a string
+        for u in parsed["updates"]:
+            updates[u["col"]] = u["val"]
+        count = self.dml_manager.update(tbl, updates, where_fn)
+        # print(f"Updated {count} rows in {tbl}.")
+        return count
+
+    # Statement handler by leading keyword, one dict lookup per statement
+    _HANDLERS = {
+        "CREATE": _execute_create,
+        "DROP": _execute_drop,
+        "INSERT": _execute_insert,
+        "SELECT": _execute_select,
+        "DELETE": _execute_delete,
+        "UPDATE": _execute_update,
+    }
 
 
 # -*- coding: utf-8 -*-
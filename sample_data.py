@@ -1,3 +1,5 @@
+import logging
+
 from ddl_manager import DDLManager
 from dml_manager import DMLManager
 from query_manager import QueryManager
@@ -11,6 +13,9 @@ storage_manager = StorageManager(
 ddl_manager = DDLManager(storage_manager)
 dml_manager = DMLManager(storage_manager)
 
+# Query timings from track_time are logged at INFO
+logging.basicConfig(level=logging.INFO)
+
 
 @track_time
 def load_data(name, data):
@@ -29,33 +34,8 @@ def load_data(name, data):
             primary_key="id",
         )
 
-    # Build once before starting
-    table_data = storage_manager.db["DATA"][name]
-    indexes = storage_manager.index.get(name, {})
-    col_names = list(storage_manager.db["COLUMNS"][name].keys())
-    pk_col = storage_manager.db["TABLES"][name].get("primary_key")
-
-    for i, (val0, val1) in enumerate(data):
-        row = [val0, val1]
-        # Append directly
-        table_data.append(row)
-        row_id = len(table_data) - 1
-
-        # Update in-memory indexes
-        for col_name, index in indexes.items():
-            col_index = col_names.index(col_name)
-            value = row[col_index]
-            tree = index["tree"]
-            if value not in tree:
-                tree[value] = []
-            tree[value].append(row_id)
-
-        if (i + 1) % 10000 == 0:
-            print((i + 1))
-
-    # Save once at the end
-    storage_manager.save_db()
-    storage_manager.save_index()
+    # One validation pass, one index update and one save for the whole load
+    dml_manager.insert_many(name, [[val0, val1] for val0, val1 in data])
 
 
 rel_i_i_1000 = []
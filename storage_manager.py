@@ -1,7 +1,57 @@
+import array
+import functools
 import os
 import pickle
 import shutil
-from BTrees.OOBTree import OOBTree
+
+from utils import DOUBLE, INT, STRING, numeric_column
+
+
+@functools.lru_cache(maxsize=None)
+def _OOBTree():
+    # BTrees loads a C extension, so defer the import until a tree is needed
+    from BTrees.OOBTree import OOBTree
+
+    return OOBTree
+
+
+def new_index_tree():
+    """Creates an empty OOBTree for an index"""
+    return _OOBTree()()
+
+
+class PostingList(array.array):
+    """Row ids stored under one index key, packed as int64 instead of boxed ints"""
+
+    # No per-instance __dict__, most keys of a unique index hold a single row
+    __slots__ = ()
+
+    def __new__(cls, rids=()):
+        return super().__new__(cls, "q", rids)
+
+    def __reduce_ex__(self, protocol):
+        # Protocols 0-2 rebuild an array as cls(typecode, items), which
+        # __new__ does not take
+        if protocol < 3:
+            return type(self), (self.tolist(),)
+        return super().__reduce_ex__(protocol)
+
+
+# Python type a value of each column type must have
+_PY_TYPES = {INT: int, STRING: str, DOUBLE: float}
+
+
+class TableSchema:
+    """Column layout of one table, derived once from db["COLUMNS"]"""
+
+    __slots__ = ("col_names", "col_idx", "col_types", "py_types")
+
+    def __init__(self, columns):
+        self.col_names = tuple(columns.keys())
+        self.col_idx = {c: i for i, c in enumerate(self.col_names)}
+        self.col_types = tuple(columns.values())
+        # None for unsupported column types, so inserts into them fail
+        self.py_types = tuple(_PY_TYPES.get(t) for t in self.col_types)
 
 
 class StorageManager:
@@ -27,6 +77,97 @@ class StorageManager:
         self.db = self.load_db()
         self.index = self.load_index()
 
+        # Table layouts by table name, dropped on every schema change
+        self._schema_cache = {}
+
+        # Columnar copies of table data: table -> (rows, len(rows), {col: array})
+        self._column_cache = {}
+
+        # Stamp of the files as this manager last read or wrote them
+        self._disk_stamp = self._stat_files()
+
+    def schema(self, table_name):
+        """Returns the cached TableSchema of a table"""
+        schema = self._schema_cache.get(table_name)
+        if schema is None:
+            schema = TableSchema(self.db["COLUMNS"][table_name])
+            self._schema_cache[table_name] = schema
+        return schema
+
+    def invalidate_schema(self, table_name=None):
+        """Drops cached schemas after DDL, for one table or all of them"""
+        if table_name is None:
+            self._schema_cache.clear()
+        else:
+            self._schema_cache.pop(table_name, None)
+        self.invalidate_columns(table_name)
+
+    def column_array(self, table_name, column_name):
+        """
+        Returns one INT/DOUBLE column of a table as a numpy array, built from
+        the row store on first use and cached until the table's rows change.
+        Returns None for string columns and columns holding NULLs.
+        """
+        rows = self.db["DATA"][table_name]
+        cached = self._column_cache.get(table_name)
+        # Appends and reassigned row lists are caught here, in-place row
+        # rewrites have to go through invalidate_columns()
+        if cached is None or cached[0] is not rows or cached[1] != len(rows):
+            cached = (rows, len(rows), {})
+            self._column_cache[table_name] = cached
+        arrays = cached[2]
+        if column_name not in arrays:
+            schema = self.schema(table_name)
+            i = schema.col_idx[column_name]
+            arrays[column_name] = numeric_column(rows, i, schema.col_types[i])
+        return arrays[column_name]
+
+    def invalidate_columns(self, table_name=None):
+        """Drops cached column arrays after DML, for one table or all of them"""
+        if table_name is None:
+            self._column_cache.clear()
+        else:
+            self._column_cache.pop(table_name, None)
+
+    def _stat_files(self):
+        """
+        Stamp of the database and index files. The inode and ctime catch a
+        file replaced by another process within the mtime granularity with
+        one of the same size, as save_index does by renaming.
+        """
+        stamp = []
+        for path in (self.db_file, self.index_file):
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                stamp.append(None)
+            else:
+                stamp.append((st.st_ino, st.st_mtime_ns, st.st_ctime_ns, st.st_size))
+        return tuple(stamp)
+
+    def refresh(self):
+        """
+        Reloads the database and index if their files changed since this
+        manager last read or wrote them. The in-memory dicts are updated in
+        place so the managers holding them stay in sync.
+        Returns whether anything was reloaded.
+        """
+        stamp = self._stat_files()
+        if stamp == self._disk_stamp:
+            return False
+
+        db = self.load_db()
+        index = self.load_index()
+        self.db.clear()
+        self.db.update(db)
+        self.index.clear()
+        self.index.update(index)
+
+        self._disk_stamp = stamp
+        # Also drops every cached column array
+        self.invalidate_schema()
+        return True
+
     def load_db(self):
    
         with open(self.db_file, "rb") as f:
@@ -35,6 +176,7 @@ class StorageManager:
     def save_db(self):
         with open(self.db_file, "wb") as f:
             pickle.dump(self.db, f)
+        self._disk_stamp = self._stat_files()
 
     def load_index(self):
 
@@ -49,10 +191,15 @@ class StorageManager:
         for table, cols in flat.items():
             idx.setdefault(table, {})
             for col, rawdict in cols.items():
-                tree = OOBTree()
+                tree = new_index_tree()
                 tree_data = rawdict["tree"]
                 name = rawdict["name"]
                 for key, rids in tree_data.items():
+                    if isinstance(rids, int):  # single row, see save_index
+                        rids = PostingList((rids,))
+                    # Index files written before PostingList hold plain lists
+                    elif not isinstance(rids, PostingList):
+                        rids = PostingList(rids)
                     tree[key] = rids
                 idx[table][col] = {"tree": tree, "name": name}
         return idx
@@ -63,8 +210,13 @@ class StorageManager:
         for table, cols in self.index.items():
             flat.setdefault(table, {})
             for col, info in cols.items():
+                # Keys holding a single row are written as a bare int, which
+                # pickles far smaller than a one-element array
                 flat[table][col] = {
-                    "tree": dict(info["tree"]),
+                    "tree": {
+                        key: rids[0] if len(rids) == 1 else rids
+                        for key, rids in info["tree"].items()
+                    },
                     "name": info["name"],
                 }
 
@@ -73,3 +225,4 @@ class StorageManager:
         with open(tmp, "wb") as f:
             pickle.dump(flat, f, protocol=pickle.HIGHEST_PROTOCOL)
         shutil.move(tmp, self.index_file)
+        self._disk_stamp = self._stat_files()
@@ -3,7 +3,7 @@ import unittest
 from storage_manager import StorageManager
 from ddl_manager import DDLManager
 from dml_manager import DMLManager
-from utils import ASC, DESC, DOUBLE, INT, MAX, MIN, STRING, SUM
+from utils import ASC, COUNT, DESC, DOUBLE, INT, MAX, MIN, STRING, SUM
 
 
 class TestDMLManager(unittest.TestCase):
@@ -113,6 +113,46 @@ class TestDMLManager(unittest.TestCase):
         with self.assertRaises(ValueError):
             self.dml_manager.insert("order_items", [201, 101, 999])
 
+    def test_insert_many(self):
+        """Test inserting several rows with one call"""
+        count = self.dml_manager.insert_many(
+            "orders", [[101, 1, 99.99], [102, 2, 49.99], [103, 1, 29.99]]
+        )
+        self.assertEqual(count, 3)
+
+        db = self.storage.load_db()
+        self.assertEqual([r[0] for r in db["DATA"]["orders"]], [101, 102, 103])
+        index = self.storage.load_index()
+        self.assertEqual(list(index["orders"]["order_id"]["tree"][103]), [2])
+
+    def test_insert_many_rejects_whole_batch(self):
+        """Test that one bad row in a batch inserts nothing"""
+        self.dml_manager.insert("orders", [101, 1, 99.99])
+        with self.assertRaises(ValueError):
+            self.dml_manager.insert_many("orders", [[102, 2, 49.99], [102, 1, 29.99]])
+        with self.assertRaises(ValueError):
+            self.dml_manager.insert_many("orders", [[103, 2, 49.99], [101, 1, 29.99]])
+        self.assertEqual(len(self.storage.db["DATA"]["orders"]), 1)
+        self.assertNotIn(102, self.storage.index["orders"]["order_id"]["tree"])
+
+    def test_insert_many_with_self_referencing_foreign_key(self):
+        """Test that a batch row may reference an earlier row of the same batch"""
+        self.ddl_manager.create_table(
+            "employees",
+            [("id", INT), ("manager_id", INT)],
+            primary_key="id",
+            foreign_keys=[("manager_id", "employees", "id")],
+        )
+        self.dml_manager.insert("employees", [1, None])
+
+        count = self.dml_manager.insert_many("employees", [[2, None], [3, 2], [4, 3], [5, 1]])
+        self.assertEqual(count, 4)
+
+        # A row referencing a later row fails, as it would inserted one by one
+        with self.assertRaises(ValueError):
+            self.dml_manager.insert_many("employees", [[7, 6], [6, None]])
+        self.assertEqual(len(self.storage.db["DATA"]["employees"]), 5)
+
     ########################## SELECT TESTS ##########################
     def test_select_all_columns(self):
         """Test selecting all columns"""
@@ -174,6 +214,92 @@ class TestDMLManager(unittest.TestCase):
         self.assertIn("Alice", names)
         self.assertIn("Bob", names)
 
+    def test_select_with_int_equality_conditions(self):
+        """Test equality conditions on int columns (bitmap filter path)"""
+        self.dml_manager.insert("orders", [101, 1, 99.99])
+        self.dml_manager.insert("orders", [102, 2, 49.99])
+        self.dml_manager.insert("orders", [103, 1, 29.99])
+
+        results = self.dml_manager.select("orders", where=["user_id", "=", 1])
+        self.assertEqual([r["order_id"] for r in results], [101, 103])
+
+        results = self.dml_manager.select(
+            "orders",
+            where={"op": "AND", "left": ["user_id", "=", 1], "right": ["order_id", "=", 103]},
+        )
+        self.assertEqual([r["order_id"] for r in results], [103])
+
+        results = self.dml_manager.select(
+            "orders",
+            where={"op": "OR", "left": ["user_id", "=", 2], "right": ["order_id", "=", 101]},
+        )
+        self.assertEqual([r["order_id"] for r in results], [101, 102])
+
+    def test_select_with_int_equality_on_large_table(self):
+        """Test equality condition on a table large enough for a parallel scan"""
+        rows = [[i, i % 1000, 1.0] for i in range(150_000)]
+        self.dml_manager.insert_many("orders", rows)
+
+        results = self.dml_manager.select(
+            "orders",
+            where={"op": "OR", "left": ["user_id", "=", 7], "right": ["order_id", "=", 149_999]},
+        )
+        self.assertEqual(
+            [r["order_id"] for r in results],
+            [i for i in range(150_000) if i % 1000 == 7] + [149_999],
+        )
+
+    def test_select_with_indexed_conditions(self):
+        """Test AND/OR conditions narrowed through an index"""
+        self.ddl_manager.create_index("orders", "user_id")
+        self.dml_manager.insert("orders", [101, 1, 99.99])
+        self.dml_manager.insert("orders", [102, 2, 49.99])
+        self.dml_manager.insert("orders", [103, 1, 29.99])
+
+        results = self.dml_manager.select(
+            "orders",
+            where={"op": "AND", "left": ["amount", ">", 50.0], "right": ["user_id", "=", 1]},
+        )
+        self.assertEqual([r["order_id"] for r in results], [101])
+
+        results = self.dml_manager.select(
+            "orders",
+            where={"op": "OR", "left": ["user_id", "=", 2], "right": ["user_id", "=", 1]},
+        )
+        self.assertEqual([r["order_id"] for r in results], [101, 102, 103])
+
+        results = self.dml_manager.select("orders", where=["user_id", "=", 3])
+        self.assertEqual(results, [])
+
+        results = self.dml_manager.select(
+            "orders",
+            where={"op": "OR", "left": ["order_id", ">", 102], "right": ["user_id", "<", 2]},
+        )
+        self.assertEqual([r["order_id"] for r in results], [101, 103])
+
+        results = self.dml_manager.select(
+            "orders",
+            where={"op": "AND", "left": ["user_id", "<=", 1], "right": ["amount", ">=", 99.99]},
+        )
+        self.assertEqual([r["order_id"] for r in results], [101])
+
+    def test_select_with_inclusive_index_range(self):
+        """Test >= and <= range scans keep the rows on the bound"""
+        self.ddl_manager.create_index("orders", "user_id")
+        for order_id, user_id in [(101, 1), (102, 2), (103, 3), (104, 2)]:
+            self.dml_manager.insert("orders", [order_id, user_id, 10.0])
+
+        # Answered by the index alone, without scanning the rows
+        self.assertEqual(self.dml_manager._indexed_ids("orders", ["user_id", ">=", 2]), {1, 2, 3})
+        self.assertEqual(self.dml_manager._indexed_ids("orders", ["user_id", "<=", 2]), {0, 1, 3})
+        self.assertEqual(self.dml_manager._indexed_ids("orders", ["user_id", ">", 2]), {2})
+
+        results = self.dml_manager.select("orders", where=["user_id", ">=", 2])
+        self.assertEqual([r["order_id"] for r in results], [102, 103, 104])
+
+        results = self.dml_manager.select("orders", where=["user_id", "<=", 2])
+        self.assertEqual([r["order_id"] for r in results], [101, 102, 104])
+
     def test_select_with_group_by(self):
         """Test selecting with group by"""
         self.dml_manager.insert("orders", [101, 1, 99.99])
@@ -212,6 +338,31 @@ class TestDMLManager(unittest.TestCase):
         self.assertEqual(results[0]["user_id"], 1)
         self.assertEqual(results[0]["amount"], 99.99)
 
+    def test_select_with_range_conditions_and_aggregation(self):
+        """Test range conditions and aggregates over the cached column arrays"""
+        self.dml_manager.insert("orders", [101, 1, 99.99])
+        self.dml_manager.insert("orders", [102, 1, 49.99])
+        self.dml_manager.insert("orders", [103, 2, 29.99])
+
+        results = self.dml_manager.select("orders", where=["amount", ">", 40.0])
+        self.assertEqual([r["order_id"] for r in results], [101, 102])
+
+        results = self.dml_manager.select(
+            "orders",
+            columns=["user_id", "amount"],
+            where=["order_id", "<", 103],
+            aggregates=[{SUM: "amount"}],
+        )
+        self.assertEqual(results, [{"user_id": 1, "amount": 149.98}])
+        self.assertIsInstance(results[0]["amount"], float)
+
+        # Updates rewrite rows in place, the cached columns must follow
+        self.dml_manager.update("orders", {"amount": 10.0}, ["order_id", "=", 101])
+        results = self.dml_manager.select(
+            "orders", columns=["amount"], aggregates=[{MAX: "amount"}]
+        )
+        self.assertEqual(results, [{"amount": 49.99}])
+
     def test_select_with_group_by_and_aggregation(self):
         """Test selecting with group by and aggregation"""
         self.dml_manager.insert("orders", [101, 1, 99.99])
@@ -233,6 +384,72 @@ class TestDMLManager(unittest.TestCase):
         self.assertEqual(results[1]["user_id"], 2)
         self.assertEqual(results[1]["amount"], 29.99)
 
+    def test_select_with_group_by_and_column_aggregates(self):
+        """Test grouped aggregates computed per group id over column arrays"""
+        self.dml_manager.insert("orders", [101, 1, 99.99])
+        self.dml_manager.insert("orders", [102, 2, 49.99])
+        self.dml_manager.insert("orders", [103, 1, 29.99])
+        self.dml_manager.insert("orders", [104, 3, 5.0])
+
+        results = self.dml_manager.select(
+            "orders",
+            columns=["user_id", "order_id"],
+            where=["order_id", "<", 104],
+            group_by=["user_id"],
+            aggregates=[{MAX: "order_id"}],
+        )
+        self.assertEqual(results, [{"user_id": 1, "order_id": 103}, {"user_id": 2, "order_id": 102}])
+
+    def test_select_with_count(self):
+        """Test COUNT(*) with and without conditions and groups"""
+        self.dml_manager.insert("orders", [101, 1, 99.99])
+        self.dml_manager.insert("orders", [102, 2, 49.99])
+        self.dml_manager.insert("orders", [103, 1, 29.99])
+
+        count_all = [{COUNT: "*"}]
+        self.assertEqual(self.dml_manager.select("orders", aggregates=count_all), [{"count": 3}])
+        self.assertEqual(
+            self.dml_manager.select("orders", where=["user_id", "=", 1], aggregates=count_all),
+            [{"count": 2}],
+        )
+        self.assertEqual(
+            self.dml_manager.select(
+                "orders",
+                columns=[],
+                where=lambda row: row["amount"] < 50.0,
+                aggregates=count_all,
+            ),
+            [{"count": 2}],
+        )
+        self.assertEqual(
+            self.dml_manager.select(
+                "orders", columns=["user_id"], group_by=["user_id"], aggregates=count_all
+            ),
+            [{"user_id": 1, "count": 2}, {"user_id": 2, "count": 1}],
+        )
+
+    def test_select_aggregates_without_matches(self):
+        """Test that COUNT(*) alone or next to other aggregates agree on no matches"""
+        self.dml_manager.insert("orders", [101, 1, 99.99])
+        self.dml_manager.insert("orders", [102, 2, 49.99])
+
+        for where in (["user_id", "=", 3], lambda row: row["amount"] > 500.0):
+            for aggregates in (
+                [{COUNT: "*"}],
+                [{COUNT: "*"}, {MAX: "amount"}],
+                [{MAX: "amount"}],
+            ):
+                results = self.dml_manager.select(
+                    "orders", columns=[], where=where, aggregates=aggregates
+                )
+                self.assertEqual(results, [])
+
+        # The bitmap path of the lone COUNT(*)
+        results = self.dml_manager.select(
+            "orders", where=["amount", ">", 500.0], aggregates=[{COUNT: "*"}]
+        )
+        self.assertEqual(results, [])
+
     def test_select_with_order_by(self):
         """Test selecting with order by"""
         self.dml_manager.insert("users", [1, "Alice", "alice@example.com"])
@@ -341,12 +558,54 @@ class TestDMLManager(unittest.TestCase):
         self.assertEqual(deleted_count, 2)
         self.assertEqual(len(self.storage.db["DATA"]["users"]), 0)
 
+    def test_delete_with_nested_conditions(self):
+        """Test deleting rows with a nested AND/OR condition"""
+        self.dml_manager.insert("users", [1, "Alice", "alice@example.com"])
+        self.dml_manager.insert("users", [2, "Bob", "bob@example.com"])
+        self.dml_manager.insert("users", [3, "Charlie", "charlie@example.com"])
+
+        deleted_count = self.dml_manager.delete(
+            "users",
+            where={
+                "op": "OR",
+                "left": ["name", "=", "Charlie"],
+                "right": {"op": "AND", "left": ["id", ">", 1], "right": ["id", "!=", 3]},
+            },
+        )
+        self.assertEqual(deleted_count, 2)
+        self.assertEqual(self.storage.db["DATA"]["users"], [[1, "Alice", "alice@example.com"]])
+
+    def test_delete_and_update_on_large_table(self):
+        """Test delete and update matching rows through the column bitmaps"""
+        self.dml_manager.insert_many("orders", ([i, i % 1000, 1.0] for i in range(150_000)))
+
+        updated = self.dml_manager.update("orders", {"amount": 2.0}, ["user_id", "=", 7])
+        self.assertEqual(updated, 150)
+        self.assertEqual(self.storage.db["DATA"]["orders"][1007], [1007, 7, 2.0])
+
+        deleted = self.dml_manager.delete("orders", where=["order_id", ">", 99])
+        self.assertEqual(deleted, 149_900)
+        self.assertEqual([r[0] for r in self.storage.db["DATA"]["orders"]], list(range(100)))
+
     def test_delete_updates_index(self):
         """Test that delete operation updates the index"""
         self.dml_manager.insert("users", [1, "Alice", "alice@example.com"])
         self.dml_manager.delete("users")
         self.assertEqual(len(self.storage.index["users"]["id"]["tree"]), 0)
 
+    def test_delete_renumbers_index(self):
+        """Test that deleting a row shifts the row ids of later rows"""
+        self.ddl_manager.create_index("orders", "user_id")
+        self.dml_manager.insert("orders", [101, 1, 99.99])
+        self.dml_manager.insert("orders", [102, 2, 49.99])
+        self.dml_manager.insert("orders", [103, 1, 29.99])
+
+        self.dml_manager.delete("orders", where=["order_id", "=", 102])
+        tree = self.storage.index["orders"]["user_id"]["tree"]
+        self.assertEqual(list(tree[1]), [0, 1])
+        self.assertNotIn(2, tree)
+        self.assertEqual(list(self.storage.index["orders"]["order_id"]["tree"][103]), [1])
+
     ########################## UPDATE TESTS ##########################
     def test_update_all_rows(self):
         """Test updating all rows in a table"""
@@ -410,6 +669,33 @@ class TestDMLManager(unittest.TestCase):
         self.assertNotIn(1, self.storage.index["users"]["id"]["tree"])
         self.assertIn(10, self.storage.index["users"]["id"]["tree"])
 
+    def test_update_keeps_index_postings_sorted(self):
+        """Test that update moves only changed values between postings"""
+        self.ddl_manager.create_index("orders", "user_id")
+        self.dml_manager.insert("orders", [101, 1, 99.99])
+        self.dml_manager.insert("orders", [102, 2, 49.99])
+        self.dml_manager.insert("orders", [103, 2, 29.99])
+
+        self.dml_manager.update("orders", {"user_id": 2}, ["order_id", "=", 101])
+        tree = self.storage.index["orders"]["user_id"]["tree"]
+        self.assertEqual(list(tree[2]), [0, 1, 2])
+        self.assertNotIn(1, tree)
+
+    def test_update_with_callable_value(self):
+        """Test that a callable update value runs once per matching row"""
+        self.dml_manager.insert("orders", [101, 1, 99.99])
+        self.dml_manager.insert("orders", [102, 2, 49.99])
+        calls = []
+
+        def bump(amount):
+            calls.append(amount)
+            return amount + 1.0
+
+        count = self.dml_manager.update("orders", {"amount": bump}, ["user_id", "=", 2])
+        self.assertEqual(count, 1)
+        self.assertEqual(calls, [49.99])
+        self.assertEqual(self.storage.db["DATA"]["orders"][1], [102, 2, 50.99])
+
     def test_update_with_duplicate_primary_key(self):
         """Test updating a row with a duplicate primary key"""
         self.dml_manager.insert("users", [1, "Alice", "alice@example.com"])
@@ -454,6 +740,28 @@ class TestDMLManager(unittest.TestCase):
         self.assertEqual(sorted(user_orders[1]), [101, 103])
         self.assertEqual(user_orders[2], [102])
 
+    def test_select_join_column_order(self):
+        """Test that all columns come left table first, whichever side is probed"""
+        self.dml_manager.insert("users", [1, "Alice", "alice@example.com"])
+        self.dml_manager.insert("orders", [101, 1, 99.99])
+        expected = [
+            "users.id", "users.name", "users.email",
+            "orders.order_id", "orders.user_id", "orders.amount",
+        ]
+
+        for order_id in (None, 102, 103):
+            if order_id is not None:
+                # orders grows larger than users, the hashed side flips
+                self.dml_manager.insert("orders", [order_id, 1, 9.99])
+            results = self.dml_manager.select_join_with_index(
+                left_table="users",
+                right_table="orders",
+                left_join_col="id",
+                right_join_col="user_id",
+            )
+            for row in results:
+                self.assertEqual(list(row), expected)
+
     def test_select_join_with_specific_columns(self):
         """Test joining two tables with specific columns"""
         self.dml_manager.insert("users", [1, "Alice", "alice@example.com"])
@@ -470,6 +778,39 @@ class TestDMLManager(unittest.TestCase):
         self.assertEqual(len(results), 1)
         self.assertEqual(results[0], {"users.name": "Alice", "orders.amount": 99.99})
 
+    def test_select_join_probes_inner_index(self):
+        """Test that the join probes the index of whichever table is inner"""
+        self.ddl_manager.create_index("orders", "user_id")
+        self.dml_manager.insert("users", [1, "Alice", "alice@example.com"])
+        self.dml_manager.insert("users", [2, "Bob", "bob@example.com"])
+        self.dml_manager.insert("orders", [101, 1, 99.99])
+
+        # orders is smaller, so users is probed and the orders index is unused
+        results = self.dml_manager.select_join_with_index(
+            left_table="users",
+            right_table="orders",
+            left_join_col="id",
+            right_join_col="user_id",
+            columns=["users.name", "orders.order_id"],
+        )
+        self.assertEqual(results, [{"users.name": "Alice", "orders.order_id": 101}])
+
+        self.dml_manager.insert("orders", [102, 2, 49.99])
+        self.dml_manager.insert("orders", [103, 2, 9.99])
+
+        # users is smaller now, so the orders index is probed
+        results = self.dml_manager.select_join_with_index(
+            left_table="users",
+            right_table="orders",
+            left_join_col="id",
+            right_join_col="user_id",
+            columns=["users.name", "orders.order_id"],
+        )
+        self.assertEqual(
+            sorted(r["orders.order_id"] for r in results if r["users.name"] == "Bob"),
+            [102, 103],
+        )
+
     def test_select_join_with_condition(self):
         """Test joining two tables with additional condition"""
         self.dml_manager.insert("users", [1, "Alice", "alice@example.com"])
@@ -533,6 +874,33 @@ class TestDMLManager(unittest.TestCase):
         self.assertEqual(results[1]["users.name"], "Alice")
         self.assertEqual(results[1]["orders.amount"], 49.99)
 
+    def test_select_join_with_condition_columns(self):
+        """Test join condition that declares the columns it reads"""
+        self.dml_manager.insert("users", [1, "Alice", "alice@example.com"])
+        self.dml_manager.insert("users", [2, "Bob", "bob@example.com"])
+        self.dml_manager.insert("orders", [101, 1, 99.99])
+        self.dml_manager.insert("orders", [102, 2, 49.99])
+
+        seen = []
+
+        def where(row):
+            seen.append(row)
+            return row["orders.amount"] > 50
+
+        where.columns = ("orders.amount",)
+
+        results = self.dml_manager.select_join_with_index(
+            left_table="users",
+            right_table="orders",
+            left_join_col="id",
+            right_join_col="user_id",
+            where=where,
+        )
+
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]["users.name"], "Alice")
+        self.assertEqual(seen, [{"orders.amount": 99.99}, {"orders.amount": 49.99}])
+
     def test_select_join_with_self(self):
         """Test joining a table with itself"""
         # Insert test data
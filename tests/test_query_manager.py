@@ -1,5 +1,6 @@
 import os
 import unittest
+from pyparsing import ParseBaseException
 from storage_manager import StorageManager
 from ddl_manager import DDLManager
 from dml_manager import DMLManager
@@ -118,6 +119,19 @@ class TestQueryManager(unittest.TestCase):
             {"UserID": {"referenced_table": "Users", "referenced_column": "UserID"}},
         )
 
+    def test_execute_create_table_primary_key_with_foreign_key(self):
+        self.setup_table_users()
+
+        query = "CREATE TABLE Profiles (UserID INT PRIMARY KEY FOREIGN KEY REFERENCES Users(UserID), Bio STRING)"
+        self.query_manager.execute_query(query)
+
+        db = self.storage.load_db()
+        self.assertEqual(db["TABLES"]["Profiles"]["primary_key"], "UserID")
+        self.assertEqual(
+            db["FOREIGN_KEYS"]["Profiles"],
+            {"UserID": {"referenced_table": "Users", "referenced_column": "UserID"}},
+        )
+
     def test_execute_create_table_with_multiple_foreign_keys(self):
         self.setup_table_users()
 
@@ -182,7 +196,7 @@ class TestQueryManager(unittest.TestCase):
         self.assertIn("Users", index)
         self.assertIn("UserID", index["Users"])
         self.assertIn(1, index["Users"]["UserID"]["tree"])
-        self.assertEqual(index["Users"]["UserID"]["tree"][1], [0])
+        self.assertEqual(list(index["Users"]["UserID"]["tree"][1]), [0])
 
     def test_execute_multiple_insert_query(self):
         self.insert_user(1, "Alice", "alice@example.com")
@@ -207,8 +221,72 @@ class TestQueryManager(unittest.TestCase):
         self.assertIn(2, index["Users"]["UserID"]["tree"])
         self.assertIn(3, index["Users"]["UserID"]["tree"])
 
-        self.assertEqual(index["Users"]["UserID"]["tree"][2], [1])
-        self.assertEqual(index["Users"]["UserID"]["tree"][3], [2])
+        self.assertEqual(list(index["Users"]["UserID"]["tree"][2]), [1])
+        self.assertEqual(list(index["Users"]["UserID"]["tree"][3]), [2])
+
+    def test_execute_insert_with_semicolon_in_string(self):
+        self.setup_table_users()
+
+        query = """INSERT INTO Users (UserID, UserName, Email) VALUES (1, 'Al;ice', 'a@x.com');;
+        INSERT INTO Users (UserID, UserName, Email) VALUES (2, 'Bob', 'b@x.com')"""
+        self.query_manager.execute_query(query)
+
+        db = self.storage.load_db()
+        self.assertEqual(
+            db["DATA"]["Users"], [[1, "Al;ice", "a@x.com"], [2, "Bob", "b@x.com"]]
+        )
+
+    def test_parse_error_reports_failing_statement(self):
+        with self.assertRaisesRegex(
+            Exception, r"statement 'SELECT \* U'.*found 'U'\s+\(at char 9\)"
+        ):
+            self.query_manager.parse_query("SELECT * U")
+
+        with self.assertRaisesRegex(
+            Exception, r"statement 'SELECT \* U'.*found 'U'\s+\(at char 30\)"
+        ):
+            self.query_manager.parse_query("SELECT * FROM Users; SELECT * U")
+
+        self.assertEqual(self.query_manager.parse_query(" ;; "), [])
+
+    def test_parse_error_from_dispatched_statement(self):
+        # CREATE tries INDEX then TABLE, the error comes from inside the
+        # column list, not from the keyword
+        with self.assertRaisesRegex(Exception, r"found ','\s+\(at char 21\)"):
+            self.query_manager.parse_query("CREATE TABLE t (a INT,")
+
+        with self.assertRaisesRegex(
+            Exception, r"Expected one of SELECT, .*found 'FOO'\s+\(at char 0\)"
+        ):
+            self.query_manager.parse_query("FOO x")
+
+    def test_parse_keyword_is_not_a_name(self):
+        for query in [
+            "SELECT * FROM WHERE",
+            "select * from Users where from = 1",
+            "INSERT INTO values VALUES (1)",
+        ]:
+            with self.assertRaisesRegex(Exception, "Query parsing error"):
+                self.query_manager.parse_query(query)
+            with self.assertRaises(ParseBaseException):
+                QueryManager.grammar.sql_script.parse_string(query, parse_all=True)
+
+    def test_parse_simple_statements_match_grammar(self):
+        grammar = QueryManager.grammar.sql_script
+        for query in [
+            "INSERT INTO Orders VALUES (1, '2023-10-01', -2.5e1, 3)",
+            "insert into Users values (2, \"Bob\", 'b;o''b')",
+            "SELECT * FROM Users;",
+            "select * from Orders where Amount >= -2.5",
+        ]:
+            parsed = self.query_manager.parse_query(query)
+            expected = grammar.parse_string(query, parse_all=True)
+            self.assertEqual(len(parsed), 1)
+            self.assertEqual(parsed[0].as_list(), expected[0].as_list())
+            self.assertEqual(
+                list(parsed[0].get("values") or []),
+                list(expected[0].get("values") or []),
+            )
 
     def test_execute_insert_with_foreign_key_query(self):
         self.setup_table_users()
@@ -234,7 +312,7 @@ class TestQueryManager(unittest.TestCase):
         self.assertIn("Orders", index)
         self.assertIn("OrderID", index["Orders"])
         self.assertIn(1, index["Orders"]["OrderID"]["tree"])
-        self.assertEqual(index["Orders"]["OrderID"]["tree"][1], [0])
+        self.assertEqual(list(index["Orders"]["OrderID"]["tree"][1]), [0])
 
     def test_execute_insert_with_wrong_data_type(self):
         self.setup_table_users()
@@ -243,6 +321,17 @@ class TestQueryManager(unittest.TestCase):
         with self.assertRaises(ValueError):
             self.query_manager.execute_query(query)
 
+    def test_execute_insert_integer_into_double_column(self):
+        self.setup_table_orders()
+        self.insert_user(1, "Alice", "alice@example.com")
+
+        query = "INSERT INTO Orders VALUES (1, '2023-10-01', 100, 1)"
+        self.query_manager.execute_query(query)
+
+        db = self.storage.load_db()
+        self.assertEqual(db["DATA"]["Orders"], [[1, "2023-10-01", 100.0, 1]])
+        self.assertIsInstance(db["DATA"]["Orders"][0][2], float)
+
     ############################# CREATE INDEX ##########################
     def test_execute_create_index_query(self):
         self.setup_table_users()
@@ -295,6 +384,48 @@ class TestQueryManager(unittest.TestCase):
 
         self.assertEqual(result, [{"UserName": "Bob"}])
 
+        query = "SELECT UserName FROM Users WHERE UserID > 1 AND UserID < 3 OR UserName = 'Alice'"
+        result, _ = self.query_manager.execute_query(query)
+
+        self.assertEqual(result, [{"UserName": "Alice"}, {"UserName": "Bob"}])
+
+    def test_execute_select_query_with_qualified_column(self):
+        self.setup_table_users()
+        self.insert_user(1, "Alice", "alice@example.com")
+        self.insert_user(2, "Bob", "bob@example.com")
+
+        query = "SELECT UserName FROM Users WHERE Users.UserID = 1"
+        result, _ = self.query_manager.execute_query(query)
+
+        self.assertEqual(result, [{"UserName": "Alice"}])
+
+        query = "DELETE FROM Users WHERE Users.UserName = 'Bob'"
+        result, _ = self.query_manager.execute_query(query)
+
+        self.assertEqual(result, 1)
+
+    def test_execute_select_query_with_unknown_column(self):
+        self.setup_table_users()
+        self.insert_user(1, "Alice", "alice@example.com")
+
+        with self.assertRaisesRegex(ValueError, "Column 'nope' does not exist"):
+            self.query_manager.execute_query("SELECT * FROM Users WHERE nope = 1")
+        with self.assertRaisesRegex(ValueError, "Column 'Orders.UserID' does not exist"):
+            self.query_manager.execute_query(
+                "SELECT * FROM Users WHERE Orders.UserID = 1"
+            )
+
+    def test_execute_select_query_with_signed_literals(self):
+        self.setup_table_orders()
+        self.insert_user(1, "Alice", "alice@example.com")
+        self.insert_order(1, "2023-01-01", -5.5, 1)
+        self.insert_order(2, "2023-01-02", 150.0, 1)
+
+        query = "SELECT OrderID FROM Orders WHERE Amount < 1.0e2 AND OrderID > -1"
+        result, _ = self.query_manager.execute_query(query)
+
+        self.assertEqual(result, [{"OrderID": 1}])
+
     def test_execute_select_query_with_join(self):
         self.setup_table_users()
         self.setup_table_orders()
@@ -314,6 +445,27 @@ class TestQueryManager(unittest.TestCase):
             ],
         )
 
+    def test_execute_select_query_with_join_with_unqualified_condition(self):
+        self.setup_table_users()
+        self.setup_table_orders()
+        self.insert_user(1, "Alice", "alice@example.com")
+        self.insert_user(2, "Bob", "bob@example.com")
+        self.insert_order(1, "2023-10-01", 100.0, 1)
+        self.insert_order(2, "2023-10-02", 200.0, 2)
+
+        query = "SELECT Users.UserName FROM Users JOIN Orders ON Users.UserID = Orders.UserID WHERE Amount > 150.0 OR UserName = 'Alice'"
+        result, _ = self.query_manager.execute_query(query)
+
+        self.assertEqual(result, [{"Users.UserName": "Alice"}, {"Users.UserName": "Bob"}])
+
+        query = "SELECT Users.UserName FROM Users JOIN Orders ON Users.UserID = Orders.UserID WHERE UserID = 1"
+        with self.assertRaisesRegex(ValueError, "'UserID' is ambiguous"):
+            self.query_manager.execute_query(query)
+
+        query = "SELECT Users.UserName FROM Users JOIN Orders ON Users.UserID = Orders.UserID WHERE nope = 1"
+        with self.assertRaisesRegex(ValueError, "'nope' does not exist"):
+            self.query_manager.execute_query(query)
+
     def test_execute_select_query_with_join_with_conditions(self):
         self.setup_table_users()
         self.setup_table_orders()
@@ -539,6 +691,42 @@ class TestQueryManager(unittest.TestCase):
         self.assertIn({"UserID": 1, "Amount": 200.0}, result)
         self.assertIn({"UserID": 2, "Amount": 50.0}, result)
 
+    def test_execute_select_with_count(self):
+        self.setup_table_users()
+        self.insert_user(1, "Alice", "alice@example.com")
+        self.insert_user(2, "Bob", "bob@example.com")
+        self.setup_table_orders()
+        self.insert_order(1, "2023-10-01", 100.0, 1)
+        self.insert_order(2, "2023-10-02", 200.0, 1)
+        self.insert_order(3, "2023-10-03", 50.0, 2)
+
+        query = "SELECT COUNT(*) FROM Orders WHERE Amount > 60.0"
+        result, _ = self.query_manager.execute_query(query)
+        self.assertEqual(result, [{"count": 2}])
+
+        query = "SELECT UserID, COUNT(*) FROM Orders GROUP BY UserID"
+        result, _ = self.query_manager.execute_query(query)
+        self.assertEqual(result, [{"UserID": 1, "count": 2}, {"UserID": 2, "count": 1}])
+
+    def test_execute_select_with_avg(self):
+        self.setup_table_users()
+        self.insert_user(1, "Alice", "alice@example.com")
+        self.insert_user(2, "Bob", "bob@example.com")
+        self.setup_table_orders()
+        self.insert_order(1, "2023-10-01", 100.0, 1)
+        self.insert_order(2, "2023-10-02", 200.0, 1)
+        self.insert_order(3, "2023-10-03", 50.0, 2)
+
+        query = "SELECT AVG(Amount) FROM Orders WHERE Amount > 60.0"
+        result, _ = self.query_manager.execute_query(query)
+        self.assertEqual(result, [{"Amount": 150.0}])
+
+        query = "SELECT UserID, AVG(Amount) FROM Orders GROUP BY UserID"
+        result, _ = self.query_manager.execute_query(query)
+        self.assertEqual(
+            result, [{"UserID": 1, "Amount": 150.0}, {"UserID": 2, "Amount": 50.0}]
+        )
+
     def test_execute_select_with_join_with_aggregation_and_group_by(self):
         self.setup_table_users()
         self.insert_user(1, "Alice", "alice@example.com")
@@ -579,6 +767,11 @@ class TestQueryManager(unittest.TestCase):
         self.assertIn(expected[0], result)
         self.assertIn(expected[1], result)
 
+        query = "SELECT UserID, SUM(Amount) FROM Orders GROUP BY UserID HAVING SUM(Amount) > 200 AND SUM(Amount) < 320"
+        result, _ = self.query_manager.execute_query(query)
+
+        self.assertEqual(result, [expected[0]])
+
     def test_execute_select_with_join_with_aggregation_and_group_by_with_having(self):
         self.setup_table_users()
         self.insert_user(1, "Alice", "alice@example.com")
@@ -623,7 +816,18 @@ class TestQueryManager(unittest.TestCase):
             db["DATA"]["Users"][0], [1, "Alice Smith", "alice@example.com"]
         )
         self.assertIn("Alice Smith", index["Users"]["UserName"]["tree"])
-        self.assertEqual(index["Users"]["UserName"]["tree"]["Alice Smith"], [0])
+        self.assertEqual(list(index["Users"]["UserName"]["tree"]["Alice Smith"]), [0])
+
+    def test_execute_update_query_keeps_literal_types(self):
+        self.setup_table_orders()
+        self.insert_user(1, "Alice", "alice@example.com")
+        self.insert_order(1, "2023-01-01", 100.0, 1)
+
+        query = "UPDATE Orders SET OrderDate = '20230102', Amount = 7.5 WHERE OrderID = 1"
+        self.query_manager.execute_query(query)
+
+        db = self.storage.load_db()
+        self.assertEqual(db["DATA"]["Orders"][0], [1, "20230102", 7.5, 1])
 
     ############################## DELETE ##########################
     def test_execute_delete_query(self):
@@ -648,6 +852,33 @@ class TestQueryManager(unittest.TestCase):
         self.assertNotIn(1, index["Users"]["UserID"])
         self.assertNotIn("Alice Smith", index["Users"]["UserName"])
 
+    def test_execute_conditions_keep_order_with_null(self):
+        self.setup_table_orders()
+        self.insert_user(1, "Alice", "alice@example.com")
+        self.insert_order(1, "a", None, 1)
+
+        # The string comparison short-circuits before the NULL Amount is
+        # compared with a number
+        query = "UPDATE Orders SET OrderDate = 'q' WHERE OrderDate = 'a' OR Amount > 5"
+        result, _ = self.query_manager.execute_query(query)
+        self.assertEqual(result, 1)
+
+        query = "SELECT OrderID FROM Orders WHERE OrderDate = 'zz' AND Amount > 5"
+        result, _ = self.query_manager.execute_query(query)
+        self.assertEqual(result, [])
+
+        query = "DELETE FROM Orders WHERE OrderDate = 'q' OR Amount > 5"
+        result, _ = self.query_manager.execute_query(query)
+        self.assertEqual(result, 1)
+
+    def test_condition_fn_keeps_order_with_null(self):
+        where_fn = self.query_manager._build_condition_fn(
+            [["Name", "=", "zz"], "AND", ["Amount", ">", 5], "OR", ["Name", "=", "a"]]
+        )
+        self.assertEqual(where_fn.columns, ("Name", "Amount", "Name"))
+        self.assertTrue(where_fn({"Name": "a", "Amount": None}))
+        self.assertFalse(where_fn({"Name": "b", "Amount": 1}))
+
     ############################## DROP INDEX ##########################
     def test_execute_drop_index_query(self):
         self.setup_table_users()
@@ -2,6 +2,7 @@ import os
 import pickle
 import unittest
 from storage_manager import (
+    PostingList,
     StorageManager,
 )
 from BTrees.OOBTree import OOBTree
@@ -67,6 +68,93 @@ class TestStorageManager(unittest.TestCase):
         self.assertIsInstance(self.storage.index["test_table"]["id"]["tree"], OOBTree)
         self.assertIsInstance(self.storage.index["test_table"]["name"]["tree"], OOBTree)
 
+    def test_save_and_load_posting_lists(self):
+        """Test that index postings load back as packed PostingLists"""
+        tree = OOBTree()
+        tree[1] = PostingList([0, 2])
+        tree[2] = [1]  # Postings saved before PostingList existed
+        tree[3] = PostingList([3])
+        self.storage.index["test_table"] = {
+            "id": {"tree": tree, "name": "test_table_id_idx"}
+        }
+        self.storage.save_index()
+
+        loaded = self.storage.load_index()["test_table"]["id"]["tree"]
+        self.assertIsInstance(loaded[1], PostingList)
+        self.assertIsInstance(loaded[2], PostingList)
+        self.assertEqual(list(loaded[1]), [0, 2])
+        self.assertEqual(list(loaded[2]), [1])
+        self.assertIsInstance(loaded[3], PostingList)
+        self.assertEqual(list(loaded[3]), [3])
+
+    def test_pickle_posting_list(self):
+        """Test that PostingLists pickle at every protocol"""
+        postings = PostingList([0, 2])
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            loaded = pickle.loads(pickle.dumps(postings, protocol))
+            self.assertIsInstance(loaded, PostingList)
+            self.assertEqual(loaded, postings)
+
+    def test_refresh_picks_up_external_writes(self):
+        """Test that refresh only reloads when another manager wrote the files"""
+        self.assertFalse(self.storage.refresh())
+        db = self.storage.db
+
+        other = StorageManager(self.db_file, self.index_file)
+        other.db["TABLES"]["test_table"] = {"name": "test_table"}
+        other.save_db()
+        other.save_index()
+
+        self.assertTrue(self.storage.refresh())
+        self.assertIs(self.storage.db, db)
+        self.assertIn("test_table", self.storage.db["TABLES"])
+        self.assertFalse(self.storage.refresh())
+
+    def test_refresh_same_size_and_mtime(self):
+        """Test that a replaced file is picked up even with its old size and mtime"""
+        self.storage.index["t"] = {"c": {"tree": {1: PostingList([0])}, "name": "a"}}
+        self.storage.save_index()
+        st = os.stat(self.index_file)
+
+        other = StorageManager(self.db_file, self.index_file)
+        other.index["t"]["c"]["name"] = "b"
+        other.save_index()
+        os.utime(self.index_file, ns=(st.st_atime_ns, st.st_mtime_ns))
+        self.assertEqual(os.stat(self.index_file).st_size, st.st_size)
+
+        self.assertTrue(self.storage.refresh())
+        self.assertEqual(self.storage.index["t"]["c"]["name"], "b")
+
+    def test_schema_cache(self):
+        """Test that table schemas are cached until invalidated"""
+        self.storage.db["COLUMNS"]["test_table"] = {"id": "int", "name": "string"}
+        schema = self.storage.schema("test_table")
+        self.assertEqual(schema.col_names, ("id", "name"))
+        self.assertEqual(schema.col_idx, {"id": 0, "name": 1})
+        self.assertIs(self.storage.schema("test_table"), schema)
+
+        self.storage.db["COLUMNS"]["test_table"] = {"id": "int"}
+        self.storage.invalidate_schema("test_table")
+        self.assertEqual(self.storage.schema("test_table").col_names, ("id",))
+
+    def test_column_array_cache(self):
+        """Test that numeric columns are cached until the table's rows change"""
+        self.storage.db["COLUMNS"]["test_table"] = {"id": "int", "name": "string"}
+        rows = [[1, "a"], [2, "b"]]
+        self.storage.db["DATA"]["test_table"] = rows
+
+        ids = self.storage.column_array("test_table", "id")
+        self.assertEqual(ids.tolist(), [1, 2])
+        self.assertIs(self.storage.column_array("test_table", "id"), ids)
+        self.assertIsNone(self.storage.column_array("test_table", "name"))
+
+        rows.append([3, "c"])
+        self.assertEqual(self.storage.column_array("test_table", "id").tolist(), [1, 2, 3])
+
+        rows[0] = [None, "a"]
+        self.storage.invalidate_columns("test_table")
+        self.assertIsNone(self.storage.column_array("test_table", "id"))
+
 
 if __name__ == "__main__":
     unittest.main()
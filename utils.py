@@ -1,7 +1,13 @@
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import operator
+import os
 import time
 import functools
 
+import numpy as np
+
 STRING = "string"
 INT = "int"
 DOUBLE = "double"
@@ -9,10 +15,14 @@ DOUBLE = "double"
 MAX = "max"
 MIN = "min"
 SUM = "sum"
+COUNT = "count"
+AVG = "avg"
 
 DESC = "desc"
 ASC = "asc"
 
+logger = logging.getLogger(__name__)
+
 
 def track_time(func):
     """Decorator to track execution time of a function."""
@@ -24,29 +34,41 @@ def track_time(func):
         end_time = time.time()
 
         execution_time = end_time - start_time
-        print(f"Query '{func.__name__}' executed in {execution_time:.6f} seconds")
+        # Lazy %-formatting, the message is only built when info logging is
+        # on, as the app and sample scripts configure it
+        logger.info("Query '%s' executed in %.6f seconds", func.__name__, execution_time)
 
         return result, execution_time
 
     return wrapper
 
 
+# The comparison operators of a where: SQL spelling, then the Python source
+# operator compiled predicates use and the function interpreted ones call
+_OPERATORS = {
+    "=": ("==", operator.eq),
+    "!=": ("!=", operator.ne),
+    "<": ("<", operator.lt),
+    ">": (">", operator.gt),
+    "<=": ("<=", operator.le),
+    ">=": (">=", operator.ge),
+}
+_CMP_OPS = {op: fn for op, (_, fn) in _OPERATORS.items()}
+_SRC_OPS = {op: src for op, (src, _) in _OPERATORS.items()}
+
+
 def eval_cond(cond, row, col_idx):
     c, op, v = cond
     val = row[col_idx[c]] if isinstance(row, list) else row[c]
-    if op == "=":
-        return val == v
-    if op == "!=":
-        return val != v
-    if op == "<":
-        return val < v
-    if op == ">":
-        return val > v
-    raise ValueError(f"Unsupported operator '{op}'")
+    cmp = _CMP_OPS.get(op)
+    if cmp is None:
+        raise ValueError(f"Unsupported operator '{op}'")
+    return cmp(val, v)
 
 
-def _make_where_fn(where, col_names):
-    col_idx = {c: i for i, c in enumerate(col_names)}
+def _make_where_fn(where, col_names, col_idx=None):
+    if col_idx is None:
+        col_idx = {c: i for i, c in enumerate(col_names)}
 
     if where is None:
         return lambda row: True
@@ -63,10 +85,18 @@ def _make_where_fn(where, col_names):
 
     elif isinstance(where, dict) and where.get("op") in ("AND", "OR"):
 
-        def where_fn(row):
-            L = eval_cond(where["left"], row, col_idx)
-            R = eval_cond(where["right"], row, col_idx)
-            return (L and R) if where["op"] == "AND" else (L or R)
+        # Either side may itself be an AND/OR
+        left = _make_where_fn(where["left"], col_names, col_idx)
+        right = _make_where_fn(where["right"], col_names, col_idx)
+        if where["op"] == "AND":
+
+            def where_fn(row):
+                return left(row) and right(row)
+
+        else:
+
+            def where_fn(row):
+                return left(row) or right(row)
 
         return where_fn
 
@@ -74,6 +104,201 @@ def _make_where_fn(where, col_names):
         raise ValueError(f"Unsupported where type: {where!r}")
 
 
+def _comparison_src(key, op, k):
+    """Source of one compiled comparison, row[key] against literal v<k>"""
+    if op not in _SRC_OPS:
+        raise ValueError(f"Unsupported operator '{op}'")
+    return f"row[{key!r}] {_SRC_OPS[op]} v{k}"
+
+
+def _compile_predicate(body, n_literals):
+    """Compile a predicate body over `row` and the literals v0, v1, ... into
+    a factory taking the literals and returning the predicate"""
+    params = ", ".join(f"v{k}" for k in range(n_literals))
+    src = f"lambda {params}: lambda row: {body}"
+    return eval(compile(src, "<where>", "eval"), {})
+
+
+def _where_template(where):
+    """Split a list/dict where into its shape, with the literals taken out,
+    and the literals: {"op": "AND", "left": ["a", "=", 1], "right": ["b", ">", 5]}
+    gives ("AND", ("a", "="), ("b", ">")) and [1, 5]."""
+    literals = []
+
+    def shape(cond):
+        if isinstance(cond, list) and len(cond) == 3:
+            c, op, v = cond
+            literals.append(v)
+            return (c, op)
+        if isinstance(cond, dict) and cond.get("op") in ("AND", "OR"):
+            return (cond["op"], shape(cond["left"]), shape(cond["right"]))
+        raise ValueError(f"Unsupported where type: {cond!r}")
+
+    return shape(where), literals
+
+
+@functools.lru_cache(maxsize=1024)
+def _compile_where_template(template, col_idx_items):
+    """Compile a where shape into a factory taking its literals and returning
+    the predicate, e.g. lambda v0, v1: lambda row: (row[0] == v0 and row[1] > v1).
+    Runs of the same AND/OR are flattened, their comparisons keep the order
+    they were written in, as short-circuiting may guard a later comparison
+    (e.g. against a NULL it cannot be compared with)."""
+    col_idx = dict(col_idx_items)
+    n_leaves = 0
+
+    def number(t):
+        # Tag each comparison with the position of its literal
+        nonlocal n_leaves
+        if len(t) == 2:
+            n_leaves += 1
+            return (t[0], t[1], n_leaves - 1)
+        return (t[0], number(t[1]), number(t[2]))
+
+    def chain(t, op):
+        if isinstance(t[1], tuple) and t[0] == op:
+            return chain(t[1], op) + chain(t[2], op)
+        return [t]
+
+    def emit(t):
+        if not isinstance(t[1], tuple):
+            c, op, k = t
+            return _comparison_src(col_idx[c], op, k)
+        op = t[0]
+        return "(" + f" {op.lower()} ".join(emit(p) for p in chain(t, op)) + ")"
+
+    body = emit(number(template))
+    return _compile_predicate(body, n_leaves)
+
+
+def compile_where(where, col_idx):
+    """Compile a list/dict where into one lambda over a raw row list.
+
+    {"op": "AND", "left": ["a", "=", 1], "right": ["b", ">", 5]} becomes
+    lambda row: (row[0] == v0 and row[1] > v1), so rows are filtered without
+    walking the condition or building a dict per row. AND/OR may nest.
+    Compiled code is cached per shape of the where, so repeating a query
+    with other literals only binds the new values.
+    """
+    template, literals = _where_template(where)
+    factory = _compile_where_template(template, tuple(col_idx.items()))
+    return factory(*literals)
+
+
+# Number of set bits for every byte value, used to popcount packed bitmaps
+_POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+_NUMERIC_KINDS = {INT: "i", DOUBLE: "f"}
+
+
+def numeric_column(rows, col_index, col_type):
+    """Copy one INT/DOUBLE column of a row-store table into a numpy array.
+
+    Returns None for string columns and for columns holding anything other
+    than plain numbers (e.g. NULLs), so callers can fall back to a
+    row-at-a-time scan.
+    """
+    kind = _NUMERIC_KINDS.get(col_type)
+    if kind is None:
+        return None
+    if not rows:
+        return np.empty(0, dtype=np.int64 if kind == "i" else np.float64)
+    arr = np.array([row[col_index] for row in rows])
+    if arr.dtype.kind != kind:
+        return None
+    return arr
+
+
+# Columns at least this long are filtered in chunks across threads; numpy
+# releases the GIL inside ufuncs. Chunks are a multiple of 8 rows so their
+# packed bitmaps can be concatenated as is.
+PARALLEL_SCAN_MIN_ROWS = 100_000
+PARALLEL_SCAN_CHUNK_ROWS = 1 << 16
+
+
+@functools.lru_cache(maxsize=None)
+def _scan_pool():
+    return ThreadPoolExecutor(max_workers=os.cpu_count() or 1)
+
+
+def cmp_bitmap(arr, op, value):
+    """Comparison filter over a numeric column, returned as a packed bitmap."""
+    cmp = _CMP_OPS[op]
+    if len(arr) < PARALLEL_SCAN_MIN_ROWS:
+        return np.packbits(cmp(arr, value))
+
+    def chunk_bits(start):
+        return np.packbits(cmp(arr[start : start + PARALLEL_SCAN_CHUNK_ROWS], value))
+
+    starts = range(0, len(arr), PARALLEL_SCAN_CHUNK_ROWS)
+    return np.concatenate(list(_scan_pool().map(chunk_bits, starts)))
+
+
+def bitmap_and(left_bits, right_bits):
+    return left_bits & right_bits
+
+
+def bitmap_or(left_bits, right_bits):
+    return left_bits | right_bits
+
+
+def bitmap_row_ids(bits, n_rows):
+    """Row ids of the set bits in a packed bitmap covering n_rows rows."""
+    return np.flatnonzero(np.unpackbits(bits, count=n_rows))
+
+
+def bitmap_count(bits):
+    """Number of rows selected by a packed bitmap (popcount)."""
+    return int(_POPCOUNT8[bits].sum())
+
+
+def agg_key(col):
+    """Result key of an aggregate over col, "count" for COUNT(*)"""
+    return COUNT if col == "*" else col
+
+
+def column_aggregate(agg_func, arr):
+    """aggregation_fn over a numeric column, returning a plain Python number"""
+    if agg_func == COUNT:
+        return len(arr)
+    if len(arr) == 0:
+        return None
+    if agg_func == MAX:
+        agg_val = arr.max()
+    elif agg_func == MIN:
+        agg_val = arr.min()
+    elif agg_func == SUM:
+        agg_val = arr.sum()
+    elif agg_func == AVG:
+        agg_val = arr.mean()
+    else:
+        raise ValueError(f"Unsupported aggregate: {agg_func}")
+    return round(agg_val.item(), 2)
+
+
+def grouped_column_aggregate(agg_func, arr, group_ids, n_groups):
+    """column_aggregate per group in one pass, for group ids 0..n_groups-1
+    numbered in order of first appearance. Returns one value per group."""
+    group_ids = np.asarray(group_ids, dtype=np.intp)
+    if agg_func == COUNT:
+        return np.bincount(group_ids, minlength=n_groups).tolist()
+    if agg_func == SUM:
+        out = np.zeros(n_groups, dtype=arr.dtype)
+        np.add.at(out, group_ids, arr)
+    elif agg_func in (MAX, MIN):
+        # Seed every group with its first value
+        out = arr[np.unique(group_ids, return_index=True)[1]]
+        ufunc = np.maximum if agg_func == MAX else np.minimum
+        ufunc.at(out, group_ids, arr)
+    elif agg_func == AVG:
+        counts = np.bincount(group_ids, minlength=n_groups)
+        out = np.bincount(group_ids, weights=arr, minlength=n_groups) / counts
+    else:
+        raise ValueError(f"Unsupported aggregate: {agg_func}")
+    return [round(v, 2) for v in out.tolist()]
+
+
 def group_by(results, group_by):
     if not all(col in results[0] for col in group_by):
         raise ValueError(
@@ -88,7 +313,9 @@ def group_by(results, group_by):
 
 
 def aggregation_fn(agg_func, values):
-    if not values:
+    if agg_func == COUNT:
+        agg_val = len(values)
+    elif not values:
         agg_val = None
     elif agg_func == MAX:
         agg_val = round(max(values), 2)
@@ -96,6 +323,8 @@ def aggregation_fn(agg_func, values):
         agg_val = round(min(values), 2)
     elif agg_func == SUM:
         agg_val = round(sum(values), 2)
+    elif agg_func == AVG:
+        agg_val = round(sum(values) / len(values), 2)
     else:
         raise ValueError(f"Unsupported aggregate: {agg_func}")
 
@@ -117,9 +346,12 @@ def aggregation(rows, aggregates, group_by=None):
 
             for agg_dict in reversed(aggregates):
                 for agg_func, col in agg_dict.items():
-                    values = [r[col] for r in row if r[col] is not None]
+                    if col == "*":
+                        values = row
+                    else:
+                        values = [r[col] for r in row if r[col] is not None]
                     agg_val = aggregation_fn(agg_func, values)
-                    result_row[f"{col}"] = agg_val
+                    result_row[agg_key(col)] = agg_val
 
             aggregated_results.append(result_row)
 
@@ -132,9 +364,12 @@ def aggregation(rows, aggregates, group_by=None):
 
         for agg_dict in reversed(aggregates):
             for agg_func, col in agg_dict.items():
-                values = [r[col] for r in rows if r[col] is not None]
+                if col == "*":
+                    values = rows
+                else:
+                    values = [r[col] for r in rows if r[col] is not None]
                 agg_val = aggregation_fn(agg_func, values)
-                result_row[f"{col}"] = agg_val
+                result_row[agg_key(col)] = agg_val
 
         aggregated_results.append(result_row)
 